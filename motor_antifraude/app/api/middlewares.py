@@ -7,7 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.core.config import settings
-from app.services.external_apis import geoip_client, bin_lookup_client
+from app.services.external_apis import lookup_ip_and_bin
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +23,6 @@ class GeoEnrichmentMiddleware(BaseHTTPMiddleware):
         return response
 
     async def _enrich(self, request: Request) -> None:
-        import asyncio
-
         forwarded_for = request.headers.get("X-Forwarded-For")
         if forwarded_for:
             ip_address = forwarded_for.split(",")[0].strip()
@@ -42,11 +40,8 @@ class GeoEnrichmentMiddleware(BaseHTTPMiddleware):
             logger.warning(f"[GeoEnrichment] No se pudo parsear el body: {e}")
             request.state.body = None
 
-        tasks = [geoip_client.lookup(ip_address)]
-        if card_bin:
-            tasks.append(bin_lookup_client.lookup(card_bin))
-
-        results: list = list(await asyncio.gather(*tasks, return_exceptions=True))
+        # Un solo MGET para ambas cachés; solo los misses llaman a las APIs
+        results: list = await lookup_ip_and_bin(ip_address, card_bin)
 
         raw_geo = results[0]
         geo_result = raw_geo if not isinstance(raw_geo, BaseException) else None
@@ -27,7 +27,9 @@ ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp"}
     summary="Registrar nuevo usuario",
     description=(
         "Registra un usuario nuevo con foto de cara para verificación biométrica. "
-        "Enviar como multipart/form-data."
+        "Enviar como multipart/form-data. Con foto, la cuenta se crea con "
+        "kyc_level 'pending' y la verificación corre en background: pasa a "
+        "'basic' si se detecta la cara o a 'none' si no (no rechaza el registro)."
     ),
 )
 async def register(
@@ -1,3 +1,6 @@
+import functools
+import hashlib
+
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -13,6 +16,9 @@ class Settings(BaseSettings):
     # Esta es la que causaba el AttributeError
     ENCRYPTION_KEY_HEX: str 
     FRAUD_HMAC_SECRET: str = "dev-secret-change-in-production"
+    # Cost factor de bcrypt para contraseñas nuevas (12 en producción;
+    # 10 aceptable en staging). checkpw usa el cost guardado en el hash.
+    BCRYPT_ROUNDS: int = 12
 
     # --- Base de Datos PostgreSQL ---
     POSTGRES_USER: str
@@ -21,6 +27,25 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str
     POSTGRES_PORT: int = 5432
     DATABASE_URL: str
+    # Pool de conexiones POR WORKER (cada proceso de gunicorn tiene el suyo,
+    # compartido por requests, AuditBatchWriter, las sub-queries del
+    # dashboard y el KYC facial en background). El total es
+    # workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) y debe quedar bajo el
+    # max_connections de Postgres (100 por defecto): con -w 4 del
+    # docker-compose, 4 × (15 + 5) = 80 deja margen para psql/migraciones.
+    # Al cambiar el número de workers, dividir el presupuesto entre ellos.
+    DB_POOL_SIZE: int = 15
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: int = 5        # segundos esperando conexión libre
+    DB_POOL_RECYCLE: int = 1800     # segundos antes de reciclar una conexión
+    # Tamaño del caché de prepared statements de asyncpg por conexión.
+    # Poner en 0 si la DB está detrás de PgBouncer en modo transaction.
+    DB_STATEMENT_CACHE_SIZE: int = 1024
+    # Auditoría por lotes (COPY): filas por lote y espera máxima en segundos.
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SEC: float = 0.5
+    # Filas máximas en espera; con la cola llena se inserta directo (backpressure)
+    AUDIT_QUEUE_MAX_SIZE: int = 10_000
 
     # --- Redis ---
     REDIS_HOST: str
@@ -36,6 +61,8 @@ class Settings(BaseSettings):
     SMTP_USER: str
     SMTP_PASSWORD: str
     EMAIL_FROM: str
+    # Conexiones SMTP persistentes en paralelo (Gmail limita las concurrentes)
+    SMTP_POOL_SIZE: int = 3
     
     EXTERNAL_API_KEY: str | None = None
     @field_validator("ALLOWED_ORIGINS", mode="before")
@@ -53,4 +80,14 @@ class Settings(BaseSettings):
     )
 
 
-settings = Settings()   
\ No newline at end of file
+settings = Settings()   
+
+
+@functools.cache
+def get_aes_key() -> bytes:
+    """
+    Clave AES-256 de la app: sha256(SECRET_KEY) → 32 bytes exactos.
+    Se calcula una sola vez por proceso. Para rotarla en caliente:
+    get_aes_key.cache_clear().
+    """
+    return hashlib.sha256(settings.SECRET_KEY.encode()).digest()
@@ -8,11 +8,12 @@ from sqlalchemy import (
     Index,
     Integer,
     Numeric,
+    SmallInteger,
     String,
     Text,
     text,
 )
-from sqlalchemy.dialects.postgresql import BYTEA, JSONB, UUID
+from sqlalchemy.dialects.postgresql import BYTEA, INET, JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -101,6 +102,14 @@ class Merchant(Base):
     )
 
 
+# ── Códigos numéricos de TransactionAudit.action ─────────────────────
+# El dashboard filtra por familia de acción; comparar un SMALLINT es más
+# barato que `action LIKE 'ACTION_BLOCK%'` fila por fila.
+ACTION_CODE_APPROVE   = 0
+ACTION_CODE_CHALLENGE = 1   # ACTION_CHALLENGE_SOFT / ACTION_CHALLENGE_HARD
+ACTION_CODE_BLOCK     = 2   # ACTION_BLOCK_REVIEW / ACTION_BLOCK_PERM
+
+
 class TransactionAudit(Base):
     __tablename__ = "transaction_audit"
 
@@ -113,8 +122,11 @@ class TransactionAudit(Base):
 
     encrypted_device_id: Mapped[bytes] = mapped_column(BYTEA, nullable=False)
     encrypted_card_bin: Mapped[bytes] = mapped_column(BYTEA, nullable=False)
+    # BLAKE2s keyed del BIN — determinista, para COUNT(DISTINCT) sin descifrar
+    card_bin_hash: Mapped[bytes] = mapped_column(BYTEA, nullable=True)
 
     action: Mapped[str] = mapped_column(String(50), nullable=False)
+    action_code: Mapped[int] = mapped_column(SmallInteger, nullable=False)  # ACTION_CODE_*
     risk_score: Mapped[int] = mapped_column(Integer, nullable=False)
     reason_codes: Mapped[list] = mapped_column(
         JSONB, nullable=False, server_default=text("'[]'::jsonb")
@@ -141,6 +153,7 @@ class TransactionAudit(Base):
     merchant_name: Mapped[str] = mapped_column(String(200), nullable=True)
     ip_country:    Mapped[str] = mapped_column(String(3),   nullable=True)  # ISO 3166-1
     gps_country:   Mapped[str] = mapped_column(String(3),   nullable=True)  # inferido
+    ip_address:    Mapped[str] = mapped_column(INET,        nullable=True)  # en claro, evita descifrar el payload
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -153,6 +166,13 @@ class TransactionAudit(Base):
         Index("idx_audit_risk_score",   "risk_score"),
         Index("idx_audit_merchant_id",  "merchant_id"),
         Index("idx_audit_created_at",   "created_at"),
+        Index("idx_audit_card_bin_hash", "card_bin_hash"),
+        # Dashboard: KPIs / heatmap filtran bloqueos dentro de la ventana
+        Index(
+            "idx_audit_created_block",
+            "created_at",
+            postgresql_where=text(f"action_code = {ACTION_CODE_BLOCK}"),
+        ),
     )
 
 class DeviceHistory(Base):
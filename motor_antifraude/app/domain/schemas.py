@@ -56,9 +56,11 @@ class NetworkType(str, Enum):
     UNKNOWN = "unknown"
 
 class KycLevel(str, Enum):
-    NONE  = "none"
-    BASIC = "basic"
-    FULL  = "full"
+    NONE    = "none"
+    # Registro con foto cuya verificación facial aún corre en background
+    PENDING = "pending"
+    BASIC   = "basic"
+    FULL    = "full"
 
 class MerchantCategory(str, Enum):
     ECOMMERCE   = "ECOMMERCE"
@@ -10,6 +10,8 @@ Mejoras sobre el cliente original:
   - socket_connect_timeout separado de socket_timeout
   - decode_responses=False porque algunos módulos guardan JSON como bytes
     y otros como string — se maneja en cada módulo con .decode() explícito
+  - Parser RESP en C (hiredis, vía redis[hiredis]): redis-py lo usa
+    automáticamente cuando está instalado
   - Logging estructurado para cada evento del ciclo de vida
   - Propiedad .is_connected para verificar estado desde el orquestador
 
@@ -25,6 +27,7 @@ Uso en FastAPI (app/main.py):
 
 import asyncio
 import logging
+import time
 
 import redis.asyncio as redis
 from redis.asyncio.retry import Retry
@@ -53,9 +56,15 @@ class RedisManager:
                               conexiones del pool siguen vivas cada 30s
     """
 
+    # /health se consulta por probes (k8s, load balancer) varias veces por
+    # segundo: el resultado del PING se reutiliza durante este intervalo.
+    PING_CACHE_TTL: float = 1.0
+
     def __init__(self):
         self.client: redis.Redis | None = None
         self._connected: bool = False
+        self._ping_checked_at: float = 0.0
+        self._ping_ok: bool = False
 
     @property
     def is_connected(self) -> bool:
@@ -148,6 +157,7 @@ class RedisManager:
     async def ping(self) -> bool:
         """
         Health check público para usar desde el endpoint /health de FastAPI.
+        Cachea el resultado PING_CACHE_TTL segundos.
 
         Ejemplo en main.py:
             @app.get("/health")
@@ -157,7 +167,15 @@ class RedisManager:
         """
         if not self.client:
             return False
-        return await self._health_check(raise_on_fail=False)
+
+        # Un PING real por PING_CACHE_TTL, sin importar cuántos probes lleguen
+        now = time.monotonic()
+        if now - self._ping_checked_at < self.PING_CACHE_TTL:
+            return self._ping_ok
+
+        self._ping_ok         = await self._health_check(raise_on_fail=False)
+        self._ping_checked_at = time.monotonic()
+        return self._ping_ok
 
 
 # Singleton — misma interfaz que el cliente original
@@ -4,17 +4,19 @@ audit_repository.py
 Repositorio de auditoría de transacciones.
 
 Responsabilidades:
-  - Cifrar campos sensibles (device_id, card_bin, ip_address, payload)
-    con AES-256-GCM antes de persistirlos.
+  - Cifrar campos sensibles (device_id, card_bin, payload) con
+    AES-256-GCM antes de persistirlos. ip_address se guarda además en
+    claro (columna INET) para que el dashboard no descifre el payload.
   - Insertar un registro en `transaction_audit` por cada evaluación
-    completada por el motor antifraude.
+    completada por el motor antifraude. Con la app levantada las filas
+    se agrupan en AuditBatchWriter y se escriben con COPY por lotes.
 
 Principios de diseño:
   - save_evaluation NUNCA lanza excepciones hacia afuera: si falla
     solo loguea el error. Se llama desde _background_updates del
     orquestador, después de que la respuesta ya fue enviada al cliente.
-  - Misma clave AES que face_service.py: sha256(SECRET_KEY)
-    → un solo origen de verdad para la clave de cifrado de la app.
+  - Misma clave AES que face_service.py: get_aes_key() en config.py,
+    sha256(SECRET_KEY) → un solo origen de verdad para la clave de la app.
   - Formato de cifrado: nonce (12 bytes) + ciphertext + tag (16 bytes)
     Idéntico al usado en FaceService._encrypt / _decrypt.
 
@@ -28,31 +30,71 @@ Uso en el orquestador:
     )
 """
 
+import asyncio
 import hashlib
-import json
+import ipaddress
+import itertools
 import logging
 import os
+import threading
 import uuid
+from datetime import datetime, timezone
 from typing import Optional
 
+import orjson
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.core.config import settings
-from app.domain.models import TransactionAudit
+from app.core.config import get_aes_key, settings
+from app.domain.models import (
+    ACTION_CODE_APPROVE,
+    ACTION_CODE_BLOCK,
+    ACTION_CODE_CHALLENGE,
+    TransactionAudit,
+)
 from app.domain.schemas import (
     ActionDecision,
     FraudEvaluationResponse,
     TransactionPayload,
 )
+from app.infrastructure.database.session import AsyncSessionLocal
 from app.services.gps_ip_mismatch import _country_from_coords
 
 logger = logging.getLogger(__name__)
 
-# ── Clave AES-256 derivada del SECRET_KEY ────────────────────────────
-# Exactamente el mismo origen que face_service.py: sha256(SECRET_KEY).
-# AES-256-GCM requiere 32 bytes exactos → sha256 produce 32 bytes.
-_AES_KEY: bytes = hashlib.sha256(settings.SECRET_KEY.encode()).digest()
+# ── ActionDecision → TransactionAudit.action_code ────────────────────
+_ACTION_CODE: dict[ActionDecision, int] = {
+    ActionDecision.ACTION_APPROVE:        ACTION_CODE_APPROVE,
+    ActionDecision.ACTION_CHALLENGE_SOFT: ACTION_CODE_CHALLENGE,
+    ActionDecision.ACTION_CHALLENGE_HARD: ACTION_CODE_CHALLENGE,
+    ActionDecision.ACTION_BLOCK_REVIEW:   ACTION_CODE_BLOCK,
+    ActionDecision.ACTION_BLOCK_PERM:     ACTION_CODE_BLOCK,
+}
+
+# ── Nonces determinísticos para AES-GCM ──────────────────────────────
+# nonce = prefijo aleatorio por proceso (8 bytes) + contador (4 bytes).
+# NIST SP 800-38D permite esta construcción mientras el par (clave, nonce)
+# nunca se repita: el prefijo distingue a cada worker y el contador a cada
+# cifrado dentro del worker. Evita un getrandom(2) por campo cifrado.
+_NONCE_CTR_MAX: int = 2 ** 32
+_nonce_lock   = threading.Lock()
+_nonce_prefix: bytes = os.urandom(8)
+_nonce_ctr    = itertools.count()
+
+
+def _next_nonce() -> bytes:
+    """
+    Devuelve un nonce de 96 bits único para get_aes_key() en este proceso.
+    Si el contador de 32 bits se agota, rota el prefijo y reinicia.
+    """
+    global _nonce_prefix, _nonce_ctr
+    with _nonce_lock:
+        ctr = next(_nonce_ctr)
+        if ctr >= _NONCE_CTR_MAX:
+            _nonce_prefix = os.urandom(8)
+            _nonce_ctr    = itertools.count(1)
+            ctr           = 0
+        return _nonce_prefix + ctr.to_bytes(4, "big")
 
 
 def _encrypt(data: bytes) -> bytes:
@@ -60,17 +102,152 @@ def _encrypt(data: bytes) -> bytes:
     Cifra bytes con AES-256-GCM.
 
     Formato del output: nonce (12 bytes) + ciphertext + GCM tag (16 bytes).
-    El nonce es aleatorio y único por llamada — se antepone al ciphertext
-    para poder recuperarlo al momento de descifrar.
+    El nonce es único por llamada (ver _next_nonce) — se antepone al
+    ciphertext para poder recuperarlo al momento de descifrar.
 
     Idéntico al patrón de FaceService._encrypt.
     """
-    aesgcm     = AESGCM(_AES_KEY)
-    nonce      = os.urandom(12)          # 96 bits — recomendado por NIST para GCM
+    aesgcm     = AESGCM(get_aes_key())
+    nonce      = _next_nonce()           # 96 bits — prefijo + contador
     ciphertext = aesgcm.encrypt(nonce, data, None)
     return nonce + ciphertext
 
 
+def _card_bin_hash(card_bin: str) -> bytes:
+    """
+    Hash determinista del BIN (BLAKE2s con clave get_aes_key(), 16 bytes).
+
+    encrypted_card_bin usa un nonce distinto por fila, así que dos BINs
+    iguales nunca comparten ciphertext. Este hash sí es estable y permite
+    COUNT(DISTINCT card_bin_hash) en el dashboard sin descifrar nada.
+    Al ser keyed no se puede revertir por fuerza bruta sin la clave.
+    """
+    return hashlib.blake2s(
+        card_bin.encode(), key=get_aes_key(), digest_size=16, person=b"card_bin",
+    ).digest()
+
+
+def _inet_or_none(value: object) -> Optional[str]:
+    """
+    Normaliza la IP para la columna INET. El router sobrescribe
+    payload.ip_address con el valor de X-Forwarded-For sin validarlo,
+    así que un valor no parseable se guarda como NULL en lugar de
+    hacer fallar el INSERT completo.
+    """
+    try:
+        return str(ipaddress.ip_address(str(value)))
+    except ValueError:
+        return None
+
+
+# ── Columnas del COPY, en el mismo orden que las tuplas de _build_record ──
+_AUDIT_COLUMNS: tuple[str, ...] = (
+    "id",
+    "user_id",
+    "encrypted_device_id",
+    "encrypted_card_bin",
+    "card_bin_hash",
+    "action",
+    "action_code",
+    "risk_score",
+    "reason_codes",
+    "transaction_type",
+    "amount",
+    "currency",
+    "encrypted_payload",
+    "response_signature",
+    "response_time_ms",
+    "merchant_id",
+    "merchant_name",
+    "ip_country",
+    "gps_country",
+    "ip_address",
+    "created_at",
+)
+
+
+def _build_record(
+    payload:     TransactionPayload,
+    final_score: int,
+    action:      ActionDecision,
+    response:    FraudEvaluationResponse,
+) -> tuple:
+    """
+    Construye la fila de `transaction_audit` como tupla lista para COPY.
+
+    Cifra todos los campos sensibles antes de escribirlos:
+      - device_id      → encrypted_device_id  (BYTEA)
+      - card_bin       → encrypted_card_bin    (BYTEA)
+                         + card_bin_hash (BLAKE2s keyed, determinista)
+      - ip_address     → parte del encrypted_payload y columna INET en claro
+      - payload JSON   → encrypted_payload     (BYTEA)
+
+    La firma HMAC de la respuesta se guarda en claro porque es
+    un hash no reversible — no expone datos sensibles.
+
+    COPY no pasa por el ORM: id y created_at se generan aquí y
+    reason_codes va como texto JSON (codec jsonb de asyncpg).
+    """
+    # ── Cifrar campos sensibles ───────────────────────────────────────
+    encrypted_device_id = _encrypt(payload.device_id.encode())
+    encrypted_card_bin  = _encrypt(payload.card_bin.encode())
+
+    # Snapshot completo del payload para trazabilidad forense.
+    # orjson serializa UUID, datetime y Enum de forma nativa;
+    # Decimal (amount) e IPvAnyAddress caen en default=str.
+    payload_dict = {
+        "user_id":          payload.user_id,
+        "device_id":        payload.device_id,
+        "card_bin":         payload.card_bin,
+        "amount":           payload.amount,
+        "currency":         payload.currency,
+        "ip_address":       payload.ip_address,
+        "latitude":         payload.latitude,
+        "longitude":        payload.longitude,
+        "transaction_type": payload.transaction_type,
+        "recipient_id":     payload.recipient_id,
+        "session_id":       payload.session_id,
+        "timestamp":        payload.timestamp,
+        "user_agent":       payload.user_agent,
+        "sdk_version":      payload.sdk_version,
+        "merchant_id":      getattr(payload, 'merchant_id', None),
+        "merchant_name":    getattr(payload, 'merchant_name', None),
+        "ip_country":       getattr(payload, 'ip_country', None),
+    }
+    encrypted_payload = _encrypt(orjson.dumps(payload_dict, default=str))
+
+    # ── Extraer ip_country y gps_country del request state si disponibles ───
+    # GeoEnrichmentMiddleware los enriquece en request.state
+    _ip_country  = getattr(payload, 'ip_country', None)
+    _gps_country = _country_from_coords(payload.latitude, payload.longitude)
+
+    # ── Tupla en el orden de _AUDIT_COLUMNS ───────────────────────────
+    return (
+        uuid.uuid4(),
+        payload.user_id,
+        encrypted_device_id,
+        encrypted_card_bin,
+        _card_bin_hash(payload.card_bin),
+        action.value,
+        _ACTION_CODE[action],
+        final_score,
+        orjson.dumps(response.reason_codes).decode(),
+        payload.transaction_type.value,
+        payload.amount,
+        payload.currency,
+        encrypted_payload,
+        response.signature,
+        response.response_time_ms,
+        # Campos para el dashboard
+        getattr(payload, 'merchant_id', None),
+        getattr(payload, 'merchant_name', None),
+        _ip_country,
+        _gps_country,
+        _inet_or_none(payload.ip_address),
+        datetime.now(timezone.utc),
+    )
+
+
 class AuditRepository:
     """
     Encapsula el INSERT en `transaction_audit`.
@@ -96,94 +273,221 @@ class AuditRepository:
         """
         Persiste el resultado de una evaluación antifraude en PostgreSQL.
 
-        Cifra todos los campos sensibles antes de escribirlos:
-          - device_id      → encrypted_device_id  (BYTEA)
-          - card_bin       → encrypted_card_bin    (BYTEA)
-          - ip_address     → parte del encrypted_payload (comparte cifrado)
-          - payload JSON   → encrypted_payload     (BYTEA)
-
-        La firma HMAC de la respuesta se guarda en claro porque es
-        un hash no reversible — no expone datos sensibles.
+        Si audit_batch_writer está corriendo (lifespan de la app), la fila
+        se encola y se escribe junto con otras en un único COPY. Si no
+        (scripts, tests), se escribe de inmediato con un COPY de una fila.
 
         Si ocurre cualquier error, lo registra en el log y retorna sin
         propagar la excepción. Esto garantiza que un fallo de DB nunca
         afecte una evaluación ya entregada al cliente.
         """
         try:
-            # ── Cifrar campos sensibles ───────────────────────────────
-            encrypted_device_id = _encrypt(payload.device_id.encode())
-            encrypted_card_bin  = _encrypt(payload.card_bin.encode())
-
-            # Snapshot completo del payload para trazabilidad forense.
-            # Serializar con json.dumps — ip_address y UUID necesitan str().
-            payload_dict = {
-                "user_id":          str(payload.user_id),
-                "device_id":        payload.device_id,
-                "card_bin":         payload.card_bin,
-                "amount":           str(payload.amount),
-                "currency":         payload.currency,
-                "ip_address":       str(payload.ip_address),
-                "latitude":         payload.latitude,
-                "longitude":        payload.longitude,
-                "transaction_type": payload.transaction_type,
-                "recipient_id":     str(payload.recipient_id) if payload.recipient_id else None,
-                "session_id":       str(payload.session_id),
-                "timestamp":        payload.timestamp.isoformat(),
-                "user_agent":       payload.user_agent,
-                "sdk_version":      payload.sdk_version,
-                "merchant_id":      str(payload.merchant_id) if getattr(payload, 'merchant_id', None) else None,
-                "merchant_name":    getattr(payload, 'merchant_name', None),
-                "ip_country":       getattr(payload, 'ip_country', None),
-            }
-            encrypted_payload = _encrypt(
-                json.dumps(payload_dict, ensure_ascii=False).encode()
-            )
+            record = _build_record(payload, final_score, action, response)
 
-            # ── Extraer ip_country y gps_country del request state si disponibles ───
-            # GeoEnrichmentMiddleware los enriquece en request.state
-            _ip_country  = getattr(payload, 'ip_country', None)
-            _gps_country = _country_from_coords(payload.latitude, payload.longitude)
-
-            # ── Construir el registro de auditoría ────────────────────
-            audit = TransactionAudit(
-                id                  = uuid.uuid4(),
-                user_id             = payload.user_id,
-                encrypted_device_id = encrypted_device_id,
-                encrypted_card_bin  = encrypted_card_bin,
-                action              = action.value,
-                risk_score          = final_score,
-                reason_codes        = response.reason_codes,
-                transaction_type    = payload.transaction_type.value,
-                amount              = payload.amount,
-                currency            = payload.currency,
-                encrypted_payload   = encrypted_payload,
-                response_signature  = response.signature,
-                response_time_ms    = response.response_time_ms,
-                # Campos para el dashboard
-                merchant_id         = getattr(payload, 'merchant_id', None),
-                merchant_name       = getattr(payload, 'merchant_name', None),
-                ip_country          = _ip_country,
-                gps_country         = _gps_country,
-            )
+            # Con el writer detenido / deteniéndose o la cola llena, la fila
+            # se escribe aquí mismo en vez de quedar en una cola sin lector
+            if audit_batch_writer.is_running and audit_batch_writer.submit(record):
+                return
 
-            # ── Persistir ─────────────────────────────────────────────
-            self.db.add(audit)
-            await self.db.commit()
+            await self.save_many([record])
 
             logger.info(
-                f"[AuditRepository] INSERT OK — "
-                f"audit_id={audit.id}  user={payload.user_id}  "
-                f"action={action.value}  score={final_score}"
+                "[AuditRepository] INSERT OK — audit_id=%s  user=%s  action=%s  score=%s",
+                record[0], payload.user_id, action.value, final_score,
             )
 
         except Exception as exc:
             # Nunca propagar — esta función es fire-and-forget.
             # Un fallo de DB no debe afectar la respuesta ya enviada.
             logger.error(
-                f"[AuditRepository] Error guardando auditoría "
-                f"user={payload.user_id}: {exc}"
+                "[AuditRepository] Error guardando auditoría user=%s: %s",
+                payload.user_id, exc,
             )
             try:
                 await self.db.rollback()
             except Exception:
                 pass  # Si el rollback también falla, ignorar
+
+    async def save_many(self, records: list[tuple]) -> None:
+        """
+        Inserta filas ya cifradas (ver _build_record) con COPY FROM en
+        formato binario y hace un único commit.
+
+        Usa la conexión asyncpg subyacente de la sesión: COPY evita el
+        ciclo parse/plan/execute por fila del INSERT del ORM.
+        A diferencia de save_evaluation, sí propaga las excepciones.
+        """
+        conn = await self.db.connection()
+        raw  = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            TransactionAudit.__tablename__,
+            records = records,
+            columns = _AUDIT_COLUMNS,
+        )
+        await self.db.commit()
+
+
+class AuditBatchWriter:
+    """
+    Agrupa las filas de auditoría en memoria y las escribe por lotes.
+
+    Un único task consume la cola: junta hasta AUDIT_BATCH_SIZE filas o
+    espera AUDIT_FLUSH_INTERVAL_SEC desde la primera, lo que ocurra antes,
+    y las inserta con un COPY usando su propia sesión (la del request ya
+    puede estar cerrada cuando corre _background_updates).
+
+    Se arranca y se detiene desde el lifespan de main.py. stop() deja de
+    aceptar filas (is_running pasa a False, save_evaluation escribe
+    directo) y vacía la cola antes de retornar. La cola es acotada: si
+    se llena, submit() devuelve False y la fila se inserta en el request.
+
+    Si el COPY de un lote falla, se reintenta fila por fila para que una
+    fila inválida o un corte breve no descarte el lote entero.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        batch_size:      int   = settings.AUDIT_BATCH_SIZE,
+        flush_interval:  float = settings.AUDIT_FLUSH_INTERVAL_SEC,
+        max_queue_size:  int   = settings.AUDIT_QUEUE_MAX_SIZE,
+    ) -> None:
+        self._session_factory = session_factory
+        self._batch_size      = batch_size
+        self._flush_interval  = flush_interval
+        self._max_queue_size  = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task:  Optional[asyncio.Task]  = None
+        self._stopping = False
+
+    @property
+    def is_running(self) -> bool:
+        # False desde que empieza stop(): lo que llegue después no se encola
+        return (
+            self._task is not None
+            and not self._task.done()
+            and not self._stopping
+        )
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self._stopping = False
+        self._queue    = asyncio.Queue(maxsize=self._max_queue_size)
+        self._task     = asyncio.create_task(self._run())
+        logger.info("[AuditBatchWriter] Iniciado")
+
+    async def stop(self) -> None:
+        if not self.is_running:
+            return
+        self._stopping = True
+        # put (no put_nowait): con la cola llena espera a que _run haga lugar
+        await self._queue.put(self._STOP)
+        await self._task
+        self._task = None
+        logger.info("[AuditBatchWriter] Detenido")
+
+    def submit(self, record: tuple) -> bool:
+        """
+        Encola la fila. Devuelve False si el writer no acepta filas
+        (deteniéndose o cola llena): el llamador la escribe directo.
+        """
+        if self._stopping:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            logger.warning(
+                "[AuditBatchWriter] Cola llena (%d filas) — insert directo",
+                self._max_queue_size,
+            )
+            return False
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await self._queue.get()
+            if item is self._STOP:
+                return
+
+            batch    = [item]
+            stopping = False
+            deadline = loop.time() + self._flush_interval
+
+            # ── Juntar más filas hasta llenar el lote o vencer el plazo ──
+            while len(batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[tuple]) -> None:
+        # Igual que save_evaluation: ningún error tumba el worker.
+        try:
+            async with self._session_factory() as db:
+                await AuditRepository(db).save_many(batch)
+            logger.info("[AuditBatchWriter] COPY OK — filas=%d", len(batch))
+            return
+        except Exception as exc:
+            if len(batch) == 1:
+                logger.error(
+                    "[AuditBatchWriter] Fila de auditoría descartada audit_id=%s: %s",
+                    batch[0][0], exc,
+                )
+                return
+            logger.warning(
+                "[AuditBatchWriter] Falló el COPY del lote filas=%d: %s — "
+                "reintentando fila por fila",
+                len(batch), exc,
+            )
+
+        await self._flush_rows(batch)
+
+    async def _flush_rows(self, batch: list[tuple]) -> None:
+        """
+        Reintento del lote con un COPY por fila en una misma sesión: solo
+        se pierden las filas que fallan por sí solas (p.ej. un constraint).
+        """
+        lost = 0
+        try:
+            async with self._session_factory() as db:
+                repo = AuditRepository(db)
+                for record in batch:
+                    try:
+                        await repo.save_many([record])
+                    except Exception as exc:
+                        lost += 1
+                        logger.error(
+                            "[AuditBatchWriter] Fila de auditoría descartada audit_id=%s: %s",
+                            record[0], exc,
+                        )
+                        await db.rollback()
+        except Exception as exc:
+            logger.error(
+                "[AuditBatchWriter] Error en el reintento fila por fila: %s", exc
+            )
+            return
+
+        logger.info(
+            "[AuditBatchWriter] Reintento fila por fila — escritas=%d descartadas=%d",
+            len(batch) - lost, lost,
+        )
+
+
+# Singleton — arrancado/detenido en el lifespan de main.py
+audit_batch_writer = AuditBatchWriter()
@@ -4,18 +4,31 @@ dashboard_repository.py
 Consultas optimizadas para el endpoint GET /v1/dashboard/summary.
 
 Todas las queries son de SOLO LECTURA (SELECT) — no modifican datos.
-Usan SQLAlchemy Core (text + parámetros) para mayor rendimiento en
-agregaciones complejas sobre transaction_audit.
+Se construyen una sola vez a nivel de módulo con SQLAlchemy Core
+(select + bindparam): SQLAlchemy reutiliza la compilación cacheada y
+asyncpg el prepared statement del mismo SQL en cada conexión del pool.
 
 Principios:
-- Una sola sesión de DB por request (inyectada desde el router).
+- Las 5 sub-consultas son independientes y corren en paralelo con
+  asyncio.gather: la sesión inyectada desde el router atiende los KPIs
+  y el resto abre su propia sesión del pool (una AsyncSession no admite
+  queries concurrentes). Latencia total ≈ max(tᵢ) en lugar de Σtᵢ.
+- Las filas se consumen con db.stream + async for: cada DTO se arma
+  a medida que llegan del driver, sin materializar antes la lista.
 - Parámetro `period_hours` para ventana de tiempo configurable.
+- El resumen completo se cachea en Redis con TTL corto
+  (dashboard:summary:{period}:{feed}:{geo}, 30s): el polling del
+  frontend no vuelve a escanear transaction_audit en cada refresco.
+  Si Redis falla se calcula directo contra PostgreSQL.
+- Si una sub-consulta falla, su sección sale vacía (el resto del
+  dashboard se sirve igual) pero ese resumen degradado NO se cachea:
+  el siguiente refresco vuelve a consultar PostgreSQL.
 - card_bin: se descifra dentro de _decrypt() si está cifrado,  
   de lo contrario se usa el campo `merchant_name` en claro que  
   guardamos desde v2 del audit (sin descifrar el BIN antiguo).
 """
 
-import hashlib
+import asyncio
 import logging
 import os
 from datetime import datetime, timedelta, timezone
@@ -23,10 +36,18 @@ from typing import Optional
 from uuid import UUID
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from sqlalchemy import func, select, text
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.core.config import settings
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+from sqlalchemy import Integer, Text, bindparam, cast, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import get_aes_key
+from app.domain.models import (
+    ACTION_CODE_APPROVE,
+    ACTION_CODE_BLOCK,
+    ACTION_CODE_CHALLENGE,
+    TransactionAudit,
+)
 from app.domain.schemas import (
     DashboardKPIs,
     DashboardSummary,
@@ -35,17 +56,41 @@ from app.domain.schemas import (
     MerchantHeatmapItem,
     TransactionFeedItem,
 )
+from app.infrastructure.cache.redis_client import redis_manager
+from app.infrastructure.database.session import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
-# ── Clave AES (misma que audit_repository.py) ────────────────────────
-_AES_KEY: bytes = hashlib.sha256(settings.SECRET_KEY.encode()).digest()
+_SUMMARY_CACHE_KEY = "dashboard:summary:{period_hours}:{feed_limit}:{geo_limit}"
+_SUMMARY_CACHE_TTL = 30   # segundos — el dashboard tolera datos de hace 30s
+
+# Orden de las sub-consultas en el gather de get_summary (para los logs)
+_SECTIONS = (
+    "kpis",
+    "geo_discrepancies",
+    "transaction_feed",
+    "merchant_heatmap",
+    "identity_risks",
+)
+
 
+def _empty_kpis() -> DashboardKPIs:
+    return DashboardKPIs(
+        total_volume=0, total_tx=0, rejected_tx=0,
+        challenged_tx=0, approved_tx=0, rejection_rate_pct=0,
+        critical_alerts_last_hour=0,
+    )
 
 def _decrypt(data: bytes) -> str:
-    """Descifra un campo AES-256-GCM. Retorna '' si falla."""
+    """
+    Descifra un campo AES-256-GCM. Retorna '' si falla.
+
+    Sin memoizar a propósito: el texto en claro (BINs, payloads) no se
+    retiene en memoria del proceso, y el polling repetido ya lo absorbe
+    la caché de 30s del resumen completo.
+    """
     try:
-        aesgcm = AESGCM(_AES_KEY)
+        aesgcm = AESGCM(get_aes_key())
         nonce      = data[:12]
         ciphertext = data[12:]
         return aesgcm.decrypt(nonce, ciphertext, None).decode()
@@ -53,6 +98,106 @@ def _decrypt(data: bytes) -> str:
         return ""
 
 
+# ── Queries precompiladas ────────────────────────────────────────────
+# :since y :limit son bindparams — el SQL generado es siempre el mismo,
+# así que el plan se cachea por conexión en lugar de re-parsearse.
+
+_ta       = TransactionAudit
+_since    = bindparam("since")
+# Códigos de acción como literales (no bindparams) para que el planner
+# pueda usar el índice parcial `WHERE action_code = 2` también con
+# planes genéricos de prepared statements.
+_is_block     = _ta.action_code == literal_column(str(ACTION_CODE_BLOCK))
+_is_challenge = _ta.action_code == literal_column(str(ACTION_CODE_CHALLENGE))
+_is_approve   = _ta.action_code == literal_column(str(ACTION_CODE_APPROVE))
+_count    = func.count()
+
+_KPIS_QUERY = (
+    select(
+        func.coalesce(func.sum(_ta.amount), 0).label("total_volume"),
+        _count.label("total_tx"),
+        _count.filter(_is_block).label("rejected_tx"),
+        _count.filter(_is_challenge).label("challenged_tx"),
+        _count.filter(_is_approve).label("approved_tx"),
+        _count.filter(
+            _is_block, _ta.created_at >= bindparam("one_hour_ago")
+        ).label("critical_alerts_last_hour"),
+    )
+    .where(_ta.created_at >= _since)
+)
+
+_GEO_QUERY = (
+    select(
+        _ta.id,
+        _ta.ip_country,
+        _ta.gps_country,
+        _ta.action,
+        _ta.risk_score,
+        _ta.created_at,
+        func.host(_ta.ip_address).label("ip_address"),
+    )
+    .where(
+        _ta.created_at >= _since,
+        or_(
+            (_ta.ip_country.is_not(None)
+             & _ta.gps_country.is_not(None)
+             & (_ta.ip_country != _ta.gps_country)),
+            _ta.risk_score >= 50,
+        ),
+    )
+    .order_by(_ta.risk_score.desc(), _ta.created_at.desc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+_FEED_QUERY = (
+    select(
+        _ta.id,
+        _ta.created_at,
+        _ta.action,
+        _ta.risk_score,
+        _ta.amount,
+        _ta.currency,
+        _ta.transaction_type,
+        _ta.merchant_name,
+        _ta.encrypted_card_bin,
+    )
+    .where(_ta.created_at >= _since)
+    .order_by(_ta.created_at.desc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+_fraud_count = _count.filter(_is_block)
+_HEATMAP_QUERY = (
+    select(
+        func.coalesce(_ta.merchant_name, "Comercio desconocido").label("merchant_name"),
+        cast(_ta.merchant_id, Text).label("merchant_id"),
+        _fraud_count.label("fraud_count"),
+        _count.label("total_count"),
+    )
+    .where(_ta.created_at >= _since)
+    .group_by(_ta.merchant_name, _ta.merchant_id)
+    .having(_fraud_count > 0)
+    .order_by(_fraud_count.desc())
+    .limit(20)
+)
+
+_distinct_bins = func.count(_ta.card_bin_hash.distinct())
+_max_risk      = func.max(_ta.risk_score)
+_IDENTITY_QUERY = (
+    select(
+        cast(_ta.user_id, Text).label("user_id"),
+        _distinct_bins.label("distinct_bins"),
+        _count.label("tx_count"),
+        _max_risk.label("max_risk_score"),
+    )
+    .where(_ta.created_at >= _since)
+    .group_by(_ta.user_id)
+    .having(_distinct_bins > 1)
+    .order_by(_distinct_bins.desc(), _max_risk.desc())
+    .limit(20)
+)
+
+
 # ─────────────────────────────────────────────────────────────────────
 
 class DashboardRepository:
@@ -60,8 +205,13 @@ class DashboardRepository:
     Repositorio de lectura para el dashboard analítico.
     """
 
-    def __init__(self, db: AsyncSession) -> None:
-        self.db = db
+    def __init__(
+        self,
+        db:              AsyncSession,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    ) -> None:
+        self.db               = db
+        self._session_factory = session_factory
 
     async def get_summary(
         self,
@@ -69,15 +219,44 @@ class DashboardRepository:
         feed_limit:   int = 20,
         geo_limit:    int = 30,
     ) -> DashboardSummary:
+        cache_key = _SUMMARY_CACHE_KEY.format(
+            period_hours = period_hours,
+            feed_limit   = feed_limit,
+            geo_limit    = geo_limit,
+        )
+        cached = await self._get_cached_summary(cache_key)
+        if cached:
+            return cached
+
         since = datetime.now(timezone.utc) - timedelta(hours=period_hours)
 
-        kpis               = await self._get_kpis(since)
-        geo_discrepancies  = await self._get_geo_discrepancies(since, geo_limit)
-        transaction_feed   = await self._get_transaction_feed(since, feed_limit)
-        merchant_heatmap   = await self._get_merchant_heatmap(since)
-        identity_risks     = await self._get_identity_risks(since)
+        results = await asyncio.gather(
+            self._get_kpis(self.db, since),
+            self._in_own_session(self._get_geo_discrepancies, since, geo_limit),
+            self._in_own_session(self._get_transaction_feed, since, feed_limit),
+            self._in_own_session(self._get_merchant_heatmap, since),
+            self._in_own_session(self._get_identity_risks, since),
+            return_exceptions = True,
+        )
 
-        return DashboardSummary(
+        # Una sección que falló sale vacía, pero el resumen no se cachea
+        degraded = False
+        for i, (section, result) in enumerate(zip(_SECTIONS, results)):
+            if isinstance(result, Exception):
+                logger.error("[Dashboard] Error en %s: %s", section, result)
+                results[i] = _empty_kpis() if section == "kpis" else []
+                degraded   = True
+            elif isinstance(result, BaseException):
+                raise result
+        (
+            kpis,
+            geo_discrepancies,
+            transaction_feed,
+            merchant_heatmap,
+            identity_risks,
+        ) = results
+
+        summary = DashboardSummary(
             generated_at      = datetime.now(timezone.utc),
             period_hours      = period_hours,
             kpis              = kpis,
@@ -86,10 +265,40 @@ class DashboardRepository:
             merchant_heatmap  = merchant_heatmap,
             identity_risks    = identity_risks,
         )
+        if not degraded:
+            await self._set_cached_summary(cache_key, summary)
+        return summary
+
+    async def _get_cached_summary(self, key: str) -> Optional[DashboardSummary]:
+        try:
+            raw = await redis_manager.client.get(key)
+            if raw:
+                return DashboardSummary.model_validate_json(raw)
+        except RedisError as exc:
+            logger.warning("[Dashboard] Error leyendo caché del resumen: %s", exc)
+        except ValidationError as exc:
+            logger.warning("[Dashboard] Resumen cacheado inválido, se recalcula: %s", exc)
+        return None
+
+    async def _set_cached_summary(self, key: str, summary: DashboardSummary) -> None:
+        try:
+            await redis_manager.client.setex(
+                key, _SUMMARY_CACHE_TTL, summary.model_dump_json()
+            )
+        except RedisError as exc:
+            logger.warning("[Dashboard] Error guardando caché del resumen: %s", exc)
+
+    async def _in_own_session(self, query, *args):
+        """
+        Ejecuta una sub-consulta en una sesión propia del pool para que
+        pueda solaparse con las demás dentro del asyncio.gather.
+        """
+        async with self._session_factory() as db:
+            return await query(db, *args)
 
     # ── KPIs ──────────────────────────────────────────────────────────
 
-    async def _get_kpis(self, since: datetime) -> DashboardKPIs:
+    async def _get_kpis(self, db: AsyncSession, since: datetime) -> DashboardKPIs:
         """
         Calcula métricas globales del período:
           - total_volume: suma de amount
@@ -97,250 +306,139 @@ class DashboardRepository:
           - rejection_rate_pct
           - critical_alerts_last_hour: bloqueadas en los últimos 60 min
         """
-        try:
-            q = text("""
-                SELECT
-                    COALESCE(SUM(amount), 0)                                    AS total_volume,
-                    COUNT(*)                                                     AS total_tx,
-                    COUNT(*) FILTER (WHERE action LIKE 'ACTION_BLOCK%')         AS rejected_tx,
-                    COUNT(*) FILTER (WHERE action LIKE 'ACTION_CHALLENGE%')     AS challenged_tx,
-                    COUNT(*) FILTER (WHERE action = 'ACTION_APPROVE')           AS approved_tx
-                FROM transaction_audit
-                WHERE created_at >= :since
-            """)
-            row = (await self.db.execute(q, {"since": since})).mappings().one()
-
-            total_tx    = int(row["total_tx"])
-            rejected_tx = int(row["rejected_tx"])
-
-            # Alertas críticas en la última hora
-            one_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
-            q2 = text("""
-                SELECT COUNT(*) AS cnt
-                FROM transaction_audit
-                WHERE created_at >= :since
-                  AND action LIKE 'ACTION_BLOCK%'
-            """)
-            alerts_row = (await self.db.execute(q2, {"since": one_hour_ago})).mappings().one()
-
-            rejection_rate = round((rejected_tx / total_tx * 100), 2) if total_tx > 0 else 0.0
-
-            return DashboardKPIs(
-                total_volume             = float(row["total_volume"]),
-                total_tx                 = total_tx,
-                rejected_tx              = rejected_tx,
-                challenged_tx            = int(row["challenged_tx"]),
-                approved_tx              = int(row["approved_tx"]),
-                rejection_rate_pct       = rejection_rate,
-                critical_alerts_last_hour = int(alerts_row["cnt"]),
-            )
-        except Exception as exc:
-            logger.error(f"[Dashboard] Error en KPIs: {exc}")
-            return DashboardKPIs(
-                total_volume=0, total_tx=0, rejected_tx=0,
-                challenged_tx=0, approved_tx=0, rejection_rate_pct=0,
-                critical_alerts_last_hour=0,
-            )
+        # Una sola pasada: critical_alerts_last_hour es un FILTER más
+        # sobre la misma ventana (one_hour_ago >= since siempre que
+        # period_hours >= 1, garantizado por el router).
+        one_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+        row = (await db.execute(
+            _KPIS_QUERY, {"since": since, "one_hour_ago": one_hour_ago}
+        )).mappings().one()
+
+        total_tx    = int(row["total_tx"])
+        rejected_tx = int(row["rejected_tx"])
+
+        rejection_rate = round((rejected_tx / total_tx * 100), 2) if total_tx > 0 else 0.0
+
+        return DashboardKPIs(
+            total_volume             = float(row["total_volume"]),
+            total_tx                 = total_tx,
+            rejected_tx              = rejected_tx,
+            challenged_tx            = int(row["challenged_tx"]),
+            approved_tx              = int(row["approved_tx"]),
+            rejection_rate_pct       = rejection_rate,
+            critical_alerts_last_hour = int(row["critical_alerts_last_hour"]),
+        )
 
     # ── Discrepancias geográficas ──────────────────────────────────────
 
     async def _get_geo_discrepancies(
-        self, since: datetime, limit: int
+        self, db: AsyncSession, since: datetime, limit: int
     ) -> list[GeoDiscrepancy]:
         """
         Devuelve transacciones donde ip_country != gps_country
         o donde alguno de los dos sea un país de alto riesgo.
         Prioriza las de mayor risk_score.
         """
-        try:
-            q = text("""
-                SELECT
-                    id,
-                    ip_country,
-                    gps_country,
-                    action,
-                    risk_score,
-                    created_at,
-                    encrypted_payload
-                FROM transaction_audit
-                WHERE created_at >= :since
-                  AND (
-                      (ip_country IS NOT NULL AND gps_country IS NOT NULL
-                       AND ip_country != gps_country)
-                      OR risk_score >= 50
-                  )
-                ORDER BY risk_score DESC, created_at DESC
-                LIMIT :limit
-            """)
-            rows = (await self.db.execute(q, {"since": since, "limit": limit})).mappings().all()
-
-            result = []
-            for r in rows:
-                # Extraer IP del payload cifrado
-                ip_str = ""
-                try:
-                    import json
-                    raw = _decrypt(bytes(r["encrypted_payload"]))
-                    ip_str = json.loads(raw).get("ip_address", "") if raw else ""
-                except Exception:
-                    pass
-
-                result.append(GeoDiscrepancy(
-                    ip_address  = ip_str,
-                    ip_country  = r["ip_country"],
-                    gps_country = r["gps_country"],
-                    action      = r["action"],
-                    risk_score  = r["risk_score"],
-                    timestamp   = r["created_at"],
-                    is_mismatch = (
-                        r["ip_country"] is not None
-                        and r["gps_country"] is not None
-                        and r["ip_country"] != r["gps_country"]
-                    ),
-                ))
-            return result
-        except Exception as exc:
-            logger.error(f"[Dashboard] Error en geo_discrepancies: {exc}")
-            return []
+        stream = await db.stream(_GEO_QUERY, {"since": since, "limit": limit})
+
+        result = []
+        async for r in stream.mappings():
+            result.append(GeoDiscrepancy(
+                ip_address  = r["ip_address"] or "",
+                ip_country  = r["ip_country"],
+                gps_country = r["gps_country"],
+                action      = r["action"],
+                risk_score  = r["risk_score"],
+                timestamp   = r["created_at"],
+                is_mismatch = (
+                    r["ip_country"] is not None
+                    and r["gps_country"] is not None
+                    and r["ip_country"] != r["gps_country"]
+                ),
+            ))
+        return result
 
     # ── Feed transaccional ────────────────────────────────────────────
 
     async def _get_transaction_feed(
-        self, since: datetime, limit: int
+        self, db: AsyncSession, since: datetime, limit: int
     ) -> list[TransactionFeedItem]:
         """
         Últimas N transacciones del período ordenadas por timestamp desc.
         No descifra el card_bin — solo expone merchant_name y metadata
         no sensible.
         """
-        try:
-            q = text("""
-                SELECT
-                    id,
-                    created_at,
-                    action,
-                    risk_score,
-                    amount,
-                    currency,
-                    transaction_type,
-                    merchant_name,
-                    encrypted_card_bin
-                FROM transaction_audit
-                WHERE created_at >= :since
-                ORDER BY created_at DESC
-                LIMIT :limit
-            """)
-            rows = (await self.db.execute(q, {"since": since, "limit": limit})).mappings().all()
-
-            result = []
-            for r in rows:
-                # Descifrar los primeros 6 del BIN para el feed (no sensible solo)
-                bin_plain = ""
-                try:
-                    bin_plain = _decrypt(bytes(r["encrypted_card_bin"]))[:6]
-                except Exception:
-                    pass
-
-                result.append(TransactionFeedItem(
-                    transaction_id   = str(r["id"]),
-                    timestamp        = r["created_at"],
-                    card_bin         = bin_plain or "XXXXXX",
-                    amount           = float(r["amount"]),
-                    currency         = r["currency"],
-                    action           = r["action"],
-                    risk_score       = r["risk_score"],
-                    merchant_name    = r["merchant_name"],
-                    transaction_type = r["transaction_type"],
-                ))
-            return result
-        except Exception as exc:
-            logger.error(f"[Dashboard] Error en transaction_feed: {exc}")
-            return []
+        stream = await db.stream(_FEED_QUERY, {"since": since, "limit": limit})
+
+        result = []
+        async for r in stream.mappings():
+            # Descifrar los primeros 6 del BIN para el feed (no sensible solo)
+            bin_plain = ""
+            try:
+                bin_plain = _decrypt(bytes(r["encrypted_card_bin"]))[:6]
+            except Exception:
+                pass
+
+            result.append(TransactionFeedItem(
+                transaction_id   = str(r["id"]),
+                timestamp        = r["created_at"],
+                card_bin         = bin_plain or "XXXXXX",
+                amount           = float(r["amount"]),
+                currency         = r["currency"],
+                action           = r["action"],
+                risk_score       = r["risk_score"],
+                merchant_name    = r["merchant_name"],
+                transaction_type = r["transaction_type"],
+            ))
+        return result
 
     # ── Mapa de calor de comercios ────────────────────────────────────
 
-    async def _get_merchant_heatmap(self, since: datetime) -> list[MerchantHeatmapItem]:
+    async def _get_merchant_heatmap(self, db: AsyncSession, since: datetime) -> list[MerchantHeatmapItem]:
         """
         Agrupa las transacciones por merchant_name y cuenta cuántas
         fueron bloqueadas (fraud_count) vs total.
         Solo incluye comercios con al menos 1 bloqueo.
         """
-        try:
-            q = text("""
-                SELECT
-                    COALESCE(merchant_name, 'Comercio desconocido') AS merchant_name,
-                    merchant_id::text,
-                    COUNT(*) FILTER (WHERE action LIKE 'ACTION_BLOCK%') AS fraud_count,
-                    COUNT(*)                                             AS total_count
-                FROM transaction_audit
-                WHERE created_at >= :since
-                GROUP BY merchant_name, merchant_id
-                HAVING COUNT(*) FILTER (WHERE action LIKE 'ACTION_BLOCK%') > 0
-                ORDER BY fraud_count DESC
-                LIMIT 20
-            """)
-            rows = (await self.db.execute(q, {"since": since})).mappings().all()
-
-            result = []
-            for r in rows:
-                total = int(r["total_count"])
-                fraud = int(r["fraud_count"])
-                result.append(MerchantHeatmapItem(
-                    merchant_name  = r["merchant_name"],
-                    merchant_id    = r["merchant_id"],
-                    fraud_count    = fraud,
-                    total_count    = total,
-                    fraud_rate_pct = round(fraud / total * 100, 1) if total > 0 else 0.0,
-                ))
-            return result
-        except Exception as exc:
-            logger.error(f"[Dashboard] Error en merchant_heatmap: {exc}")
-            return []
+        stream = await db.stream(_HEATMAP_QUERY, {"since": since})
+
+        result = []
+        async for r in stream.mappings():
+            total = int(r["total_count"])
+            fraud = int(r["fraud_count"])
+            result.append(MerchantHeatmapItem(
+                merchant_name  = r["merchant_name"],
+                merchant_id    = r["merchant_id"],
+                fraud_count    = fraud,
+                total_count    = total,
+                fraud_rate_pct = round(fraud / total * 100, 1) if total > 0 else 0.0,
+            ))
+        return result
 
     # ── Riesgos de identidad (velocity por BIN) ───────────────────────
 
-    async def _get_identity_risks(self, since: datetime) -> list[IdentityRiskItem]:
+    async def _get_identity_risks(self, db: AsyncSession, since: datetime) -> list[IdentityRiskItem]:
         """
         Detecta usuarios que usaron más de 1 BIN distinto en el período:
         señal de identity theft / card stuffing.
-        Agrupa por user_id y cuenta el BYTEA distinto del encrypted_card_bin
-        como proxy de BINs distintos (exacto si el nonce varía, aproximado
-        si el mismo BIN se cifra con diferentes nonces).
-
-        Para una detección exacta necesitarías descifrar cada row —
-        este approx es suficiente para el dashboard de monitoreo.
+        Agrupa por user_id y cuenta card_bin_hash distintos — hash
+        determinista del BIN, así que el conteo es exacto (el
+        encrypted_card_bin no sirve: cada fila lleva un nonce distinto).
         """
-        try:
-            q = text("""
-                SELECT
-                    user_id::text,
-                    COUNT(DISTINCT encrypted_card_bin)  AS distinct_bins,
-                    COUNT(*)                             AS tx_count,
-                    MAX(risk_score)                      AS max_risk_score
-                FROM transaction_audit
-                WHERE created_at >= :since
-                GROUP BY user_id
-                HAVING COUNT(DISTINCT encrypted_card_bin) > 1
-                ORDER BY distinct_bins DESC, max_risk_score DESC
-                LIMIT 20
-            """)
-            rows = (await self.db.execute(q, {"since": since})).mappings().all()
-
-            result = []
-            for r in rows:
-                bins  = int(r["distinct_bins"])
-                score = int(r["max_risk_score"])
-                risk_level = "HIGH" if bins >= 4 or score >= 70 else (
-                    "MEDIUM" if bins >= 2 or score >= 40 else "LOW"
-                )
-                result.append(IdentityRiskItem(
-                    user_id        = r["user_id"],
-                    distinct_bins  = bins,
-                    tx_count       = int(r["tx_count"]),
-                    max_risk_score = score,
-                    risk_level     = risk_level,
-                ))
-            return result
-        except Exception as exc:
-            logger.error(f"[Dashboard] Error en identity_risks: {exc}")
-            return []
+        stream = await db.stream(_IDENTITY_QUERY, {"since": since})
+
+        result = []
+        async for r in stream.mappings():
+            bins  = int(r["distinct_bins"])
+            score = int(r["max_risk_score"])
+            risk_level = "HIGH" if bins >= 4 or score >= 70 else (
+                "MEDIUM" if bins >= 2 or score >= 40 else "LOW"
+            )
+            result.append(IdentityRiskItem(
+                user_id        = r["user_id"],
+                distinct_bins  = bins,
+                tx_count       = int(r["tx_count"]),
+                max_risk_score = score,
+                risk_level     = risk_level,
+            ))
+        return result
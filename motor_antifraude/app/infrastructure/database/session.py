@@ -19,6 +19,7 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from app.core.config import settings
+from app.domain.models import Base
 
 # Fix asyncpg issue with sslmode
 db_url = settings.DATABASE_URL
@@ -30,8 +31,16 @@ engine = create_async_engine(
     db_url,
     echo           = settings.DEBUG,   # Loggea SQL solo en desarrollo
     pool_pre_ping  = True,             # Verifica conexión antes de usarla
-    pool_size      = 10,               # Conexiones permanentes en el pool
-    max_overflow   = 20,               # Conexiones extra bajo carga alta
+    pool_size      = settings.DB_POOL_SIZE,     # Conexiones permanentes
+    max_overflow   = settings.DB_MAX_OVERFLOW,  # Conexiones extra bajo carga alta
+    pool_timeout   = settings.DB_POOL_TIMEOUT,  # Falla rápido si el pool se agota
+    pool_recycle   = settings.DB_POOL_RECYCLE,  # Evita conexiones cortadas por idle
+    # Prepared statements cacheados por conexión (SQLAlchemy + asyncpg).
+    # DB_STATEMENT_CACHE_SIZE=0 los desactiva para PgBouncer transaction mode.
+    connect_args   = {
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "statement_cache_size":          settings.DB_STATEMENT_CACHE_SIZE,
+    },
 )
 
 # ── Fábrica de sesiones ───────────────────────────────────────────────
@@ -50,6 +59,9 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     Inyecta una sesión de base de datos en cada request.
     Se cierra automáticamente al terminar el request.
 
+    No hace commit automático: los endpoints de solo lectura no pagan
+    un COMMIT extra. Los que escriben llaman `await db.commit()`.
+
     Uso en un router:
         @router.post("/algo")
         async def mi_endpoint(db: AsyncSession = Depends(get_db)):
@@ -58,7 +70,6 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
         except Exception:
             await session.rollback()
             raise
@@ -71,6 +82,5 @@ async def init_db() -> None:
     Solo usar en desarrollo — en producción usar Alembic.
     Llamar desde el lifespan de main.py si settings.DEBUG es True.
     """
-    from app.domain.models import Base
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
@@ -6,6 +6,13 @@ Servicio de envío de emails via SMTP con Gmail.
 Usa aiosmtplib para envío asíncrono sin bloquear el event loop.
 Compatible con cualquier servidor SMTP — configurado para Gmail.
 
+Mantiene un pool (SMTPPool) de SMTP_POOL_SIZE conexiones autenticadas
+entre requests: el handshake TCP + STARTTLS + AUTH se paga una vez por
+conexión y no por cada email, y una ráfaga de OTPs se envía en paralelo
+(una sesión SMTP solo admite un envío a la vez). Las conexiones que el
+servidor cerró se reconectan al tomarlas del pool. El pool se abre y se
+cierra en el lifespan de main.py (start / aclose).
+
 Instalación requerida:
     pip install aiosmtplib
 
@@ -14,17 +21,377 @@ Uso:
     await email_service.send_otp(to="usuario@gmail.com", otp_code="847291")
 """
 
+import asyncio
+import base64
+import functools
 import logging
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import secrets
+from email.header import Header
+from email.utils import formataddr, parseaddr
+from typing import Optional
 
 import aiosmtplib
+import jinja2
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+# ── Templates HTML ───────────────────────────────────────────────────
+# Se compilan una sola vez al importar el módulo; cada envío solo hace
+# render() con las variables. autoescape escapa los valores interpolados.
+_jinja_env = jinja2.Environment(autoescape=True)
+
+_OTP_TPL = _jinja_env.from_string("""
+<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+</head>
+<body style="margin:0; padding:0; background-color:#f4f4f4; font-family:Arial,sans-serif;">
+    <table width="100%" cellpadding="0" cellspacing="0">
+        <tr>
+            <td align="center" style="padding:40px 0;">
+                <table width="480" cellpadding="0" cellspacing="0"
+                       style="background:#ffffff; border-radius:8px;
+                              box-shadow:0 2px 8px rgba(0,0,0,0.08);">
+
+                    <!-- Header -->
+                    <tr>
+                        <td style="background:#1a1a2e; border-radius:8px 8px 0 0;
+                                   padding:24px 32px;">
+                            <h1 style="color:#ffffff; margin:0; font-size:22px;
+                                       font-weight:700; letter-spacing:1px;">
+                                Wallet Plux
+                            </h1>
+                        </td>
+                    </tr>
+
+                    <!-- Body -->
+                    <tr>
+                        <td style="padding:32px;">
+                            <p style="color:#333333; font-size:16px; margin:0 0 8px;">
+                                Código de verificación
+                            </p>
+                            <p style="color:#666666; font-size:14px; margin:0 0 24px;">
+                                Ingresa este código para confirmar tu transacción.
+                                Válido por <strong>5 minutos</strong>.
+                            </p>
+
+                            <!-- OTP Box -->
+                            <div style="background:#f0f4ff; border:2px solid #4361ee;
+                                        border-radius:8px; padding:20px;
+                                        text-align:center; margin:0 0 24px;">
+                                <span style="font-size:36px; font-weight:700;
+                                             color:#4361ee; letter-spacing:10px;">
+                                    {{ otp_code }}
+                                </span>
+                            </div>
+
+                            <p style="color:#999999; font-size:12px; margin:0;">
+                                Si no solicitaste este código, ignora este mensaje.
+                                Nunca compartas tu código con nadie.
+                            </p>
+                        </td>
+                    </tr>
+
+                    <!-- Footer -->
+                    <tr>
+                        <td style="background:#f9f9f9; border-radius:0 0 8px 8px;
+                                   padding:16px 32px; border-top:1px solid #eeeeee;">
+                            <p style="color:#aaaaaa; font-size:11px; margin:0;
+                                       text-align:center;">
+                                © 2026 Wallet Plux. Este es un mensaje automático.
+                            </p>
+                        </td>
+                    </tr>
+
+                </table>
+            </td>
+        </tr>
+    </table>
+</body>
+</html>
+""")
+
+_CONFIRMATION_TPL = _jinja_env.from_string("""
+<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="UTF-8"></head>
+<body style="margin:0; padding:0; background-color:#f4f4f4; font-family:Arial,sans-serif;">
+    <table width="100%" cellpadding="0" cellspacing="0">
+        <tr>
+            <td align="center" style="padding:40px 0;">
+                <table width="480" cellpadding="0" cellspacing="0"
+                       style="background:#ffffff; border-radius:8px;
+                              box-shadow:0 2px 8px rgba(0,0,0,0.08);">
+                    <tr>
+                        <td style="background:#1a1a2e; border-radius:8px 8px 0 0;
+                                   padding:24px 32px;">
+                            <h1 style="color:#ffffff; margin:0; font-size:22px;">
+                                Wallet Plux
+                            </h1>
+                        </td>
+                    </tr>
+                    <tr>
+                        <td style="padding:32px;">
+                            <div style="text-align:center; margin-bottom:24px;">
+                                <span style="font-size:48px;">✅</span>
+                            </div>
+                            <h2 style="color:#333333; text-align:center;
+                                       margin:0 0 8px;">
+                                Transacción aprobada
+                            </h2>
+                            <p style="color:#666666; text-align:center;
+                                      font-size:14px; margin:0 0 24px;">
+                                Tu pago fue procesado exitosamente.
+                            </p>
+                            <table width="100%" style="background:#f9f9f9;
+                                                       border-radius:8px;
+                                                       padding:16px;">
+                                <tr>
+                                    <td style="color:#666666; font-size:14px;
+                                               padding:4px 0;">Monto:</td>
+                                    <td style="color:#333333; font-size:14px;
+                                               font-weight:700; text-align:right;
+                                               padding:4px 0;">
+                                        {{ amount }} {{ currency }}
+                                    </td>
+                                </tr>
+                                <tr>
+                                    <td style="color:#666666; font-size:12px;
+                                               padding:4px 0;">ID:</td>
+                                    <td style="color:#aaaaaa; font-size:11px;
+                                               text-align:right; padding:4px 0;">
+                                        {{ transaction_id }}
+                                    </td>
+                                </tr>
+                            </table>
+                        </td>
+                    </tr>
+                    <tr>
+                        <td style="background:#f9f9f9; border-radius:0 0 8px 8px;
+                                   padding:16px 32px; border-top:1px solid #eeeeee;">
+                            <p style="color:#aaaaaa; font-size:11px; margin:0;
+                                       text-align:center;">
+                                © 2026 Wallet Plux. Este es un mensaje automático.
+                            </p>
+                        </td>
+                    </tr>
+                </table>
+            </td>
+        </tr>
+    </table>
+</body>
+</html>
+""")
+
+# Sin variables: se renderiza una vez y se reutiliza el string
+_REJECTION_HTML: str = _jinja_env.from_string("""
+<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="UTF-8"></head>
+<body style="margin:0; padding:0; background-color:#f4f4f4; font-family:Arial,sans-serif;">
+    <table width="100%" cellpadding="0" cellspacing="0">
+        <tr>
+            <td align="center" style="padding:40px 0;">
+                <table width="480" cellpadding="0" cellspacing="0"
+                       style="background:#ffffff; border-radius:8px;
+                              box-shadow:0 2px 8px rgba(0,0,0,0.08);">
+                    <tr>
+                        <td style="background:#1a1a2e; border-radius:8px 8px 0 0;
+                                   padding:24px 32px;">
+                            <h1 style="color:#ffffff; margin:0; font-size:22px;">
+                                Wallet Plux
+                            </h1>
+                        </td>
+                    </tr>
+                    <tr>
+                        <td style="padding:32px; text-align:center;">
+                            <span style="font-size:48px;">❌</span>
+                            <h2 style="color:#333333; margin:16px 0 8px;">
+                                Transacción no procesada
+                            </h2>
+                            <p style="color:#666666; font-size:14px; margin:0 0 16px;">
+                                No pudimos procesar tu transacción por políticas
+                                de seguridad. Si crees que esto es un error,
+                                contacta a soporte.
+                            </p>
+                        </td>
+                    </tr>
+                    <tr>
+                        <td style="background:#f9f9f9; border-radius:0 0 8px 8px;
+                                   padding:16px 32px; border-top:1px solid #eeeeee;">
+                            <p style="color:#aaaaaa; font-size:11px; margin:0;
+                                       text-align:center;">
+                                © 2026 Wallet Plux. Este es un mensaje automático.
+                            </p>
+                        </td>
+                    </tr>
+                </table>
+            </td>
+        </tr>
+    </table>
+</body>
+</html>
+""").render()
+
+
+
+# ── Mensaje RFC 5322 pre-armado ──────────────────────────────────────
+# Se evita email.mime (generator + regex por mensaje): el esqueleto
+# multipart/alternative es un template de bytes y por envío solo se
+# sustituyen To, Subject y el cuerpo HTML ya codificado en base64.
+_BOUNDARY = f"==============={secrets.token_hex(16)}==".encode()
+
+_MESSAGE_TEMPLATE = (
+    b"From: %s\r\n"
+    b"To: %s\r\n"
+    b"Subject: %s\r\n"
+    b"MIME-Version: 1.0\r\n"
+    b'Content-Type: multipart/alternative; boundary="' + _BOUNDARY + b'"\r\n'
+    b"\r\n"
+    b"--" + _BOUNDARY + b"\r\n"
+    b'Content-Type: text/html; charset="utf-8"\r\n'
+    b"Content-Transfer-Encoding: base64\r\n"
+    b"\r\n"
+    b"%s\r\n"
+    b"--" + _BOUNDARY + b"--\r\n"
+)
+
+_FROM_ADDR   = parseaddr(settings.EMAIL_FROM)[1]
+_FROM_HEADER = formataddr(parseaddr(settings.EMAIL_FROM), charset="utf-8").encode()
+
+
+def _encode_body(html: str) -> bytes:
+    """HTML → base64 en líneas de 76 caracteres separadas por CRLF."""
+    return base64.encodebytes(html.encode()).rstrip(b"\n").replace(b"\n", b"\r\n")
+
+
+@functools.lru_cache(maxsize=32)
+def _encode_subject(subject: str) -> bytes:
+    # Los asuntos son fijos por tipo de email: se codifican (RFC 2047) una vez
+    return Header(subject, "utf-8").encode(linesep="\r\n").encode()
+
+
+def _build_message(to: str, subject: str, body: bytes) -> bytes:
+    if "\r" in to or "\n" in to:
+        raise ValueError(f"Destinatario inválido: {to!r}")
+    return _MESSAGE_TEMPLATE % (
+        _FROM_HEADER,
+        formataddr(("", to), charset="utf-8").encode(),
+        _encode_subject(subject),
+        body,
+    )
+
+
+# El rechazo es siempre idéntico: asunto y cuerpo (ya codificado en
+# base64) se construyen una sola vez y se insertan tal cual en cada envío.
+_REJECTION_SUBJECT = "Transacción no procesada — Wallet Plux"
+_REJECTION_BODY    = _encode_body(_REJECTION_HTML)
+
+
+class SMTPPool:
+    """
+    Pool acotado de clientes aiosmtplib.SMTP reutilizables.
+
+    Los clientes viven en una asyncio.Queue: acquire() bloquea si están
+    todos en uso y verifica con NOOP que la sesión siga viva antes de
+    entregarla; si no, la reconecta. release() la devuelve a la cola.
+
+    Tras close() el pool no entrega ni recibe clientes: los que estaban
+    prestados se cierran al devolverse en vez de crear un pool nuevo.
+    """
+
+    def __init__(self, size: int) -> None:
+        self._size   = size
+        self._queue: Optional[asyncio.Queue] = None
+        self._closed = False
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._closed:
+            raise aiosmtplib.SMTPException("Pool SMTP cerrado")
+        # Creación perezosa: scripts que no pasan por lifespan también funcionan
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            for _ in range(self._size):
+                self._queue.put_nowait(aiosmtplib.SMTP(
+                    hostname  = settings.SMTP_HOST,
+                    port      = settings.SMTP_PORT,
+                    start_tls = True,
+                ))
+        return self._queue
+
+    @staticmethod
+    async def reconnect(client: aiosmtplib.SMTP) -> None:
+        if client.is_connected:
+            client.close()
+        await client.connect()
+        await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+
+    async def start(self) -> None:
+        """Conecta y autentica todos los clientes por adelantado."""
+        self._closed = False
+        queue   = self._get_queue()
+        clients = [queue.get_nowait() for _ in range(queue.qsize())]
+        results = await asyncio.gather(
+            *(self.reconnect(c) for c in clients), return_exceptions=True
+        )
+        for client in clients:
+            queue.put_nowait(client)
+
+        failed = sum(isinstance(r, Exception) for r in results)
+        if failed:
+            # No es fatal: acquire() reintenta la conexión bajo demanda
+            logger.warning("[Email] %d/%d conexiones SMTP fallaron al iniciar", failed, len(clients))
+
+    async def acquire(self) -> aiosmtplib.SMTP:
+        client = await self._get_queue().get()
+        try:
+            try:
+                if not client.is_connected:
+                    raise aiosmtplib.SMTPServerDisconnected("Sesión SMTP cerrada")
+                await client.noop()
+            except aiosmtplib.SMTPException:
+                await self.reconnect(client)
+        except BaseException:
+            # Fallo o cancelación (p.ej. CancelledError durante el NOOP): la
+            # sesión puede quedar a medias, se cierra para que el próximo
+            # acquire la reconecte, y el cliente vuelve siempre a la cola.
+            if client.is_connected:
+                client.close()
+            self.release(client)
+            raise
+        return client
+
+    def release(self, client: aiosmtplib.SMTP) -> None:
+        if self._closed:
+            # Devuelto después de close(): no se recrea el pool
+            if client.is_connected:
+                client.close()
+            return
+        self._get_queue().put_nowait(client)
+
+    async def close(self) -> None:
+        """
+        Envía QUIT a las conexiones libres. Llamado desde lifespan. Las
+        prestadas en ese momento se cierran cuando vuelven (release).
+        """
+        self._closed = True
+        if self._queue is None:
+            return
+        while not self._queue.empty():
+            client = self._queue.get_nowait()
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+        self._queue = None
+
+
 class EmailService:
     """
     Envía emails transaccionales via SMTP asíncrono.
@@ -35,33 +402,50 @@ class EmailService:
       - send_rejection()    → notifica que la transacción fue rechazada
     """
 
-    async def _send(self, to: str, subject: str, html: str) -> bool:
+    def __init__(self) -> None:
+        self._pool = SMTPPool(settings.SMTP_POOL_SIZE)
+
+    async def start(self) -> None:
+        await self._pool.start()
+
+    async def aclose(self) -> None:
+        await self._pool.close()
+
+    async def _send(
+        self,
+        to:      str,
+        subject: str,
+        html:    Optional[str]   = None,
+        body:    Optional[bytes] = None,
+    ) -> bool:
         """
-        Método base de envío. Maneja la conexión SMTP y el envío.
-        Retorna True si se envió correctamente, False si hubo error.
+        Método base de envío. Toma una conexión del pool y la devuelve.
+        Recibe el HTML o el cuerpo ya codificado (body) para mensajes
+        constantes. Retorna True si se envió, False si hubo error.
         """
-        message = MIMEMultipart("alternative")
-        message["From"]    = settings.EMAIL_FROM
-        message["To"]      = to
-        message["Subject"] = subject
-        message.attach(MIMEText(html, "html"))
-
         try:
-            await aiosmtplib.send(
-                message,
-                hostname  = settings.SMTP_HOST,
-                port      = settings.SMTP_PORT,
-                username  = settings.SMTP_USER,
-                password  = settings.SMTP_PASSWORD,
-                start_tls = True,
+            raw = _build_message(
+                to, subject, body if body is not None else _encode_body(html)
             )
-            logger.info(f"[Email] Enviado correctamente a {to} — asunto: {subject}")
+
+            client = await self._pool.acquire()
+            try:
+                try:
+                    await client.sendmail(_FROM_ADDR, [to], raw)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # La sesión murió entre el NOOP y el envío — reconectar una vez
+                    await self._pool.reconnect(client)
+                    await client.sendmail(_FROM_ADDR, [to], raw)
+            finally:
+                self._pool.release(client)
+
+            logger.info("[Email] Enviado correctamente a %s — asunto: %s", to, subject)
             return True
 
         except aiosmtplib.SMTPException as e:
-            logger.error(f"[Email] Error SMTP enviando a {to}: {e}")
+            logger.error("[Email] Error SMTP enviando a %s: %s", to, e)
         except Exception as e:
-            logger.error(f"[Email] Error inesperado enviando a {to}: {e}")
+            logger.error("[Email] Error inesperado enviando a %s: %s", to, e)
 
         return False
 
@@ -78,78 +462,7 @@ class EmailService:
           otp_code → código de 6 dígitos generado por OtpService
         """
         subject = "Tu código de verificación — Wallet Plux"
-        html = f"""
-        <!DOCTYPE html>
-        <html lang="es">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        </head>
-        <body style="margin:0; padding:0; background-color:#f4f4f4; font-family:Arial,sans-serif;">
-            <table width="100%" cellpadding="0" cellspacing="0">
-                <tr>
-                    <td align="center" style="padding:40px 0;">
-                        <table width="480" cellpadding="0" cellspacing="0"
-                               style="background:#ffffff; border-radius:8px;
-                                      box-shadow:0 2px 8px rgba(0,0,0,0.08);">
-
-                            <!-- Header -->
-                            <tr>
-                                <td style="background:#1a1a2e; border-radius:8px 8px 0 0;
-                                           padding:24px 32px;">
-                                    <h1 style="color:#ffffff; margin:0; font-size:22px;
-                                               font-weight:700; letter-spacing:1px;">
-                                        Wallet Plux
-                                    </h1>
-                                </td>
-                            </tr>
-
-                            <!-- Body -->
-                            <tr>
-                                <td style="padding:32px;">
-                                    <p style="color:#333333; font-size:16px; margin:0 0 8px;">
-                                        Código de verificación
-                                    </p>
-                                    <p style="color:#666666; font-size:14px; margin:0 0 24px;">
-                                        Ingresa este código para confirmar tu transacción.
-                                        Válido por <strong>5 minutos</strong>.
-                                    </p>
-
-                                    <!-- OTP Box -->
-                                    <div style="background:#f0f4ff; border:2px solid #4361ee;
-                                                border-radius:8px; padding:20px;
-                                                text-align:center; margin:0 0 24px;">
-                                        <span style="font-size:36px; font-weight:700;
-                                                     color:#4361ee; letter-spacing:10px;">
-                                            {otp_code}
-                                        </span>
-                                    </div>
-
-                                    <p style="color:#999999; font-size:12px; margin:0;">
-                                        Si no solicitaste este código, ignora este mensaje.
-                                        Nunca compartas tu código con nadie.
-                                    </p>
-                                </td>
-                            </tr>
-
-                            <!-- Footer -->
-                            <tr>
-                                <td style="background:#f9f9f9; border-radius:0 0 8px 8px;
-                                           padding:16px 32px; border-top:1px solid #eeeeee;">
-                                    <p style="color:#aaaaaa; font-size:11px; margin:0;
-                                               text-align:center;">
-                                        © 2026 Wallet Plux. Este es un mensaje automático.
-                                    </p>
-                                </td>
-                            </tr>
-
-                        </table>
-                    </td>
-                </tr>
-            </table>
-        </body>
-        </html>
-        """
+        html = _OTP_TPL.render(otp_code=otp_code)
         return await self._send(to=to, subject=subject, html=html)
 
     async def send_confirmation(
@@ -163,77 +476,11 @@ class EmailService:
         Envía confirmación de transacción aprobada.
         """
         subject = "Transacción confirmada — Wallet Plux"
-        html = f"""
-        <!DOCTYPE html>
-        <html lang="es">
-        <head><meta charset="UTF-8"></head>
-        <body style="margin:0; padding:0; background-color:#f4f4f4; font-family:Arial,sans-serif;">
-            <table width="100%" cellpadding="0" cellspacing="0">
-                <tr>
-                    <td align="center" style="padding:40px 0;">
-                        <table width="480" cellpadding="0" cellspacing="0"
-                               style="background:#ffffff; border-radius:8px;
-                                      box-shadow:0 2px 8px rgba(0,0,0,0.08);">
-                            <tr>
-                                <td style="background:#1a1a2e; border-radius:8px 8px 0 0;
-                                           padding:24px 32px;">
-                                    <h1 style="color:#ffffff; margin:0; font-size:22px;">
-                                        Wallet Plux
-                                    </h1>
-                                </td>
-                            </tr>
-                            <tr>
-                                <td style="padding:32px;">
-                                    <div style="text-align:center; margin-bottom:24px;">
-                                        <span style="font-size:48px;">✅</span>
-                                    </div>
-                                    <h2 style="color:#333333; text-align:center;
-                                               margin:0 0 8px;">
-                                        Transacción aprobada
-                                    </h2>
-                                    <p style="color:#666666; text-align:center;
-                                              font-size:14px; margin:0 0 24px;">
-                                        Tu pago fue procesado exitosamente.
-                                    </p>
-                                    <table width="100%" style="background:#f9f9f9;
-                                                               border-radius:8px;
-                                                               padding:16px;">
-                                        <tr>
-                                            <td style="color:#666666; font-size:14px;
-                                                       padding:4px 0;">Monto:</td>
-                                            <td style="color:#333333; font-size:14px;
-                                                       font-weight:700; text-align:right;
-                                                       padding:4px 0;">
-                                                {amount} {currency}
-                                            </td>
-                                        </tr>
-                                        <tr>
-                                            <td style="color:#666666; font-size:12px;
-                                                       padding:4px 0;">ID:</td>
-                                            <td style="color:#aaaaaa; font-size:11px;
-                                                       text-align:right; padding:4px 0;">
-                                                {transaction_id}
-                                            </td>
-                                        </tr>
-                                    </table>
-                                </td>
-                            </tr>
-                            <tr>
-                                <td style="background:#f9f9f9; border-radius:0 0 8px 8px;
-                                           padding:16px 32px; border-top:1px solid #eeeeee;">
-                                    <p style="color:#aaaaaa; font-size:11px; margin:0;
-                                               text-align:center;">
-                                        © 2026 Wallet Plux. Este es un mensaje automático.
-                                    </p>
-                                </td>
-                            </tr>
-                        </table>
-                    </td>
-                </tr>
-            </table>
-        </body>
-        </html>
-        """
+        html = _CONFIRMATION_TPL.render(
+            amount         = amount,
+            currency       = currency,
+            transaction_id = transaction_id,
+        )
         return await self._send(to=to, subject=subject, html=html)
 
     async def send_rejection(self, to: str) -> bool:
@@ -241,56 +488,7 @@ class EmailService:
         Notifica al usuario que su transacción fue rechazada.
         El mensaje es genérico a propósito — no revelar la razón del rechazo.
         """
-        subject = "Transacción no procesada — Wallet Plux"
-        html = """
-        <!DOCTYPE html>
-        <html lang="es">
-        <head><meta charset="UTF-8"></head>
-        <body style="margin:0; padding:0; background-color:#f4f4f4; font-family:Arial,sans-serif;">
-            <table width="100%" cellpadding="0" cellspacing="0">
-                <tr>
-                    <td align="center" style="padding:40px 0;">
-                        <table width="480" cellpadding="0" cellspacing="0"
-                               style="background:#ffffff; border-radius:8px;
-                                      box-shadow:0 2px 8px rgba(0,0,0,0.08);">
-                            <tr>
-                                <td style="background:#1a1a2e; border-radius:8px 8px 0 0;
-                                           padding:24px 32px;">
-                                    <h1 style="color:#ffffff; margin:0; font-size:22px;">
-                                        Wallet Plux
-                                    </h1>
-                                </td>
-                            </tr>
-                            <tr>
-                                <td style="padding:32px; text-align:center;">
-                                    <span style="font-size:48px;">❌</span>
-                                    <h2 style="color:#333333; margin:16px 0 8px;">
-                                        Transacción no procesada
-                                    </h2>
-                                    <p style="color:#666666; font-size:14px; margin:0 0 16px;">
-                                        No pudimos procesar tu transacción por políticas
-                                        de seguridad. Si crees que esto es un error,
-                                        contacta a soporte.
-                                    </p>
-                                </td>
-                            </tr>
-                            <tr>
-                                <td style="background:#f9f9f9; border-radius:0 0 8px 8px;
-                                           padding:16px 32px; border-top:1px solid #eeeeee;">
-                                    <p style="color:#aaaaaa; font-size:11px; margin:0;
-                                               text-align:center;">
-                                        © 2026 Wallet Plux. Este es un mensaje automático.
-                                    </p>
-                                </td>
-                            </tr>
-                        </table>
-                    </td>
-                </tr>
-            </table>
-        </body>
-        </html>
-        """
-        return await self._send(to=to, subject=subject, html=html)
+        return await self._send(to=to, subject=_REJECTION_SUBJECT, body=_REJECTION_BODY)
 
 
 # Singleton
@@ -1,12 +1,16 @@
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
 from app.core.config import settings
 from app.core.exceptions import FraudMotorException
 from app.infrastructure.cache.redis_client import redis_manager
+from app.infrastructure.database.audit_repository import audit_batch_writer
 from app.infrastructure.database.session import init_db
+from app.infrastructure.messaging.email_service import email_service
+from app.services.auth_service import auth_service
+from app.services.external_apis import close_http_client
 from app.api.routers import transactions
 from app.api.routers import auth
 from app.api.routers import dashboard
@@ -19,19 +23,44 @@ from app.api.middlewares import (
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    """
+    Único punto de arranque/apagado de la app: cada recurso se abre una
+    vez aquí y se cierra en orden inverso, aunque falle un paso del medio.
+    """
     await redis_manager.connect()
-    if settings.DEBUG:
-        await init_db()
-    yield
-    await redis_manager.disconnect()
+    try:
+        if settings.DEBUG:
+            await init_db()
+        await auth_service.recover_stale_pending()
+        await audit_batch_writer.start()
+        try:
+            await email_service.start()
+            try:
+                yield
+            finally:
+                try:
+                    # Verificaciones faciales en curso antes de cerrar el resto
+                    await auth_service.aclose()
+                finally:
+                    try:
+                        await close_http_client()
+                    finally:
+                        await email_service.aclose()
+        finally:
+            # Vacía la cola de auditoría antes de soltar Redis/DB
+            await audit_batch_writer.stop()
+    finally:
+        await redis_manager.disconnect()
 
 
 app = FastAPI(
-    title    = "Motor Antifraude API",
-    version  = "1.0.0",
-    docs_url = "/docs"  if settings.DEBUG else None,
-    redoc_url= "/redoc" if settings.DEBUG else None,
-    lifespan = lifespan,
+    title                  = "Motor Antifraude API",
+    version                = "1.0.0",
+    docs_url               = "/docs"  if settings.DEBUG else None,
+    redoc_url              = "/redoc" if settings.DEBUG else None,
+    lifespan               = lifespan,
+    # orjson (C) serializa todas las respuestas en lugar de json stdlib
+    default_response_class = ORJSONResponse,
 )
 
 # Middlewares — registrar en este orden (CORS primero, ejecuta último)
@@ -47,8 +76,8 @@ app.include_router(dashboard.router)
 @app.exception_handler(FraudMotorException)
 async def fraud_exception_handler(
     request: Request, exc: FraudMotorException
-) -> JSONResponse:
-    return JSONResponse(
+) -> ORJSONResponse:
+    return ORJSONResponse(
         status_code = exc.status_code,
         content     = {"error": exc.message},
     )
@@ -61,4 +90,12 @@ async def health_check():
         "status":      "ok",
         "environment": settings.ENVIRONMENT,
         "redis":       "ok" if redis_ok else "degraded",
-    }
\ No newline at end of file
+    }
+
+
+if __name__ == "__main__":
+    # Arranque local: event loop uvloop y parser HTTP httptools (ambos en C).
+    # En Docker el CMD pasa los mismos flags (--loop uvloop --http httptools).
+    import uvicorn
+
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
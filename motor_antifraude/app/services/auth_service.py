@@ -1,13 +1,18 @@
+import asyncio
+import functools
 import hashlib
 from typing import Optional
 import logging
 import uuid
+import time
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
 import jwt
-from sqlalchemy import select
+from sqlalchemy import exists, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
 from app.core.config import settings
 from app.core.exceptions import (
@@ -21,7 +26,9 @@ from app.core.exceptions import (
     FaceNotDetectedException,
 )
 from app.domain.models import User
+from app.infrastructure.database.session import AsyncSessionLocal
 from app.domain.schemas import (
+    KycLevel,
     UserRegisterResponse,
     UserLoginResponse,
     CurrentUser,
@@ -29,12 +36,56 @@ from app.domain.schemas import (
 
 logger = logging.getLogger(__name__)
 
-JWT_ALGORITHM    = "HS256"
-JWT_EXPIRE_HOURS = 24
+# El stack de reconocimiento facial (dlib) tarda en importarse: se paga una
+# vez al arrancar el worker y no en el primer registro con foto.
+# Sin el módulo, los registros con foto NO se rechazan (antes del KYC en
+# background un fallo del import sí rechazaba el registro con
+# FaceNotDetectedException): la cuenta se crea y queda en kyc_level "none".
+# Por eso se avisa con un error al arrancar en vez de degradar en silencio.
+try:
+    from app.services.face_service import face_service
+except ImportError as e:
+    face_service = None
+    logger.error(
+        "[Auth] face_service no disponible (%s): el KYC facial está "
+        "desactivado y los registros con foto quedan en kyc_level 'none'",
+        e,
+    )
+
+JWT_ALGORITHM      = "HS256"
+JWT_EXPIRE_HOURS   = 24
+JWT_EXPIRE_SECONDS = JWT_EXPIRE_HOURS * 3600
+
+# Bindings locales para el camino caliente del login
+_UTC = timezone.utc
+_now = datetime.now
+
+# Instancia propia con las opciones resueltas al importar: exp obligatorio
+_jwt = jwt.PyJWT(options={"require": ["exp"]})
+
+# Al apagar se espera hasta este tiempo a que terminen las fotos en curso
+FACE_DRAIN_TIMEOUT_SEC = 10.0
+# Un "pending" más viejo que esto quedó huérfano (el worker murió a mitad)
+FACE_PENDING_STALE_AFTER = timedelta(minutes=10)
 
 
 class AuthService:
 
+    def __init__(self) -> None:
+        # Tareas de procesamiento facial en curso (ver _process_face_async)
+        self._face_tasks: set[asyncio.Task] = set()
+        # Estado SHA-256 con el prefijo "{SECRET_KEY}:" ya procesado.
+        # Mismo digest que antes: los cedula_hash existentes siguen válidos.
+        self._cedula_hasher = hashlib.sha256(f"{settings.SECRET_KEY}:".encode())
+        # verify_token corre en cada request autenticado: clave en bytes y
+        # argumentos de decode fijados una sola vez.
+        self._jwt_key    = settings.SECRET_KEY.encode()
+        self._jwt_decode = functools.partial(
+            _jwt.decode,
+            key        = self._jwt_key,
+            algorithms = [JWT_ALGORITHM],
+        )
+
     async def register(
         self,
         db: AsyncSession,
@@ -45,59 +96,166 @@ class AuthService:
         face_image_bytes: Optional[bytes] = None,
     ) -> UserRegisterResponse:
 
-        await self._check_email_available(db, email)
-        await self._check_username_available(db, username)
-        await self._check_cedula_available(db, cedula)
-
-        hashed_password = bcrypt.hashpw(
-            password.encode(),
-            bcrypt.gensalt(rounds=12),
-        ).decode()
-
         cedula_hash  = self._hash_cedula(cedula)
         cedula_last4 = cedula[-4:]
 
-        face_image_encrypted    = None
-        face_encoding_encrypted = None
-        if face_image_bytes:
-            try:
-                from app.services.face_service import face_service
-                face_image_encrypted, face_encoding_encrypted = (
-                    await face_service.process_registration_photo(face_image_bytes)
-                )
-            except FaceNotDetectedException:
-                raise
-            except Exception as e:
-                logger.error(f"[Auth] Error procesando foto de cara: {e}")
-                raise FaceNotDetectedException()
-
-        user = User(
-            id                      = uuid.uuid4(),
-            email                   = email.lower(),
-            username                = username.lower(),
-            hashed_password         = hashed_password,
-            cedula_hash             = cedula_hash,
-            cedula_last4            = cedula_last4,
-            face_image_encrypted    = face_image_encrypted,
-            face_encoding_encrypted = face_encoding_encrypted,
-            kyc_level               = "basic",
-            mfa_active              = False,
-            is_active               = True,
-            is_suspended            = False,
+        # bcrypt es CPU-bound (~250 ms con 12 rounds): se corre en el
+        # thread pool para no congelar el event loop del worker.
+        loop = asyncio.get_running_loop()
+        hashed_password = (await loop.run_in_executor(
+            None,
+            bcrypt.hashpw,
+            password.encode(),
+            bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS),
+        )).decode()
+
+        # Con foto, la cuenta nace en KYC "pending": la detección facial
+        # corre en background (_process_face_async) y no retrasa la respuesta.
+        kyc_level = KycLevel.PENDING.value if face_image_bytes else KycLevel.BASIC.value
+
+        # Un solo INSERT: los UNIQUE de email / username / cedula_hash
+        # detectan duplicados sin SELECT previo ni carrera TOCTOU.
+        # Sin conflict target → DO NOTHING ante cualquiera de los tres.
+        stmt = (
+            pg_insert(User)
+            .values(
+                id                      = uuid.uuid4(),
+                email                   = email.lower(),
+                username                = username.lower(),
+                hashed_password         = hashed_password,
+                cedula_hash             = cedula_hash,
+                cedula_last4            = cedula_last4,
+                kyc_level               = kyc_level,
+                mfa_active              = False,
+                is_active               = True,
+                is_suspended            = False,
+            )
+            .on_conflict_do_nothing()
+            .returning(User.id)
         )
+        user_id = (await db.execute(stmt)).scalar_one_or_none()
+
+        if user_id is None:
+            await self._raise_conflict(db, email, username, cedula_hash)
 
-        db.add(user)
         await db.commit()
 
-        logger.info(f"[Auth] Usuario registrado: {email} (id={user.id})")
+        logger.info("[Auth] Usuario registrado: %s (id=%s)", email, user_id)
+
+        if face_image_bytes:
+            task = asyncio.create_task(
+                self._process_face_async(user_id, face_image_bytes)
+            )
+            # Referencia fuerte hasta que termine (create_task no la guarda)
+            self._face_tasks.add(task)
+            task.add_done_callback(self._face_tasks.discard)
 
         return UserRegisterResponse(
-            user_id  = user.id,
-            email    = user.email,
-            username = user.username,
-            message  = "Cuenta creada exitosamente.",
+            user_id  = user_id,
+            email    = email.lower(),
+            username = username.lower(),
+            message  = (
+                "Cuenta creada. Verificación facial en proceso."
+                if face_image_bytes else "Cuenta creada exitosamente."
+            ),
         )
 
+    async def _process_face_async(self, user_id: uuid.UUID, face_image_bytes: bytes) -> None:
+        """
+        Procesa la foto de registro fuera del request y actualiza el
+        usuario con una sesión propia: kyc_level pasa a "basic" si se
+        detectó la cara, o a "none" si no.
+
+        A diferencia del registro síncrono, una foto sin cara (o un fallo
+        del pipeline facial) ya no rechaza el registro: la cuenta queda
+        creada con kyc_level "none" y el usuario puede reintentar la
+        verificación desde la app. Si la tarea se cancela (apagado del
+        worker) también se guarda "none" para no dejarla en "pending".
+        """
+        face_image_encrypted    = None
+        face_encoding_encrypted = None
+        kyc_level               = KycLevel.NONE.value
+        cancelled               = False
+        try:
+            if face_service is None:
+                raise RuntimeError("face_service no disponible en este despliegue")
+            face_image_encrypted, face_encoding_encrypted = (
+                await face_service.process_registration_photo(face_image_bytes)
+            )
+            kyc_level = KycLevel.BASIC.value
+        except FaceNotDetectedException:
+            logger.warning("[Auth] No se detectó cara en la foto (id=%s)", user_id)
+        except asyncio.CancelledError:
+            logger.warning("[Auth] Procesamiento facial cancelado (id=%s)", user_id)
+            cancelled = True
+        except Exception as e:
+            logger.error("[Auth] Error procesando foto de cara (id=%s): %s", user_id, e)
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(
+                        face_image_encrypted    = face_image_encrypted,
+                        face_encoding_encrypted = face_encoding_encrypted,
+                        kyc_level               = kyc_level,
+                    )
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error("[Auth] Error guardando KYC facial (id=%s): %s", user_id, e)
+
+        if cancelled:
+            raise asyncio.CancelledError()
+
+    async def aclose(self, timeout: float = FACE_DRAIN_TIMEOUT_SEC) -> None:
+        """
+        Llamar desde el lifespan al apagar: espera a las fotos en curso y
+        cancela las que no terminen a tiempo (cada una guarda "none").
+        """
+        if not self._face_tasks:
+            return
+        tasks = set(self._face_tasks)
+        _, still_running = await asyncio.wait(tasks, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        if still_running:
+            logger.warning(
+                "[Auth] %d verificaciones faciales canceladas al apagar",
+                len(still_running),
+            )
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+    async def recover_stale_pending(self) -> int:
+        """
+        Llamar desde el lifespan al arrancar: un worker que murió sin
+        apagado limpio deja usuarios en "pending" para siempre. Los que
+        llevan más de FACE_PENDING_STALE_AFTER pasan a "none" (reintentan
+        desde la app). El umbral evita pisar tareas vivas de otro worker.
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(User)
+                    .where(
+                        User.kyc_level  == KycLevel.PENDING.value,
+                        User.updated_at <  _now(_UTC) - FACE_PENDING_STALE_AFTER,
+                    )
+                    .values(kyc_level = KycLevel.NONE.value)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error("[Auth] Error recuperando KYC facial pendiente: %s", e)
+            return 0
+
+        if result.rowcount:
+            logger.warning(
+                "[Auth] %d usuarios con KYC facial huérfano pasaron a 'none'",
+                result.rowcount,
+            )
+        return result.rowcount
+
     async def login(
         self,
         db: AsyncSession,
@@ -105,15 +263,29 @@ class AuthService:
         password: str,
     ) -> UserLoginResponse:
 
+        # Solo las columnas que usa el login / JWT: evita traer los BLOBs
+        # de la cara (face_image_encrypted puede pesar cientos de KB).
         result = await db.execute(
-            select(User).where(User.email == email.lower())
+            select(User)
+            .options(load_only(
+                User.id,
+                User.email,
+                User.username,
+                User.hashed_password,
+                User.kyc_level,
+                User.is_active,
+                User.is_suspended,
+            ))
+            .where(User.email == email.lower())
         )
         user = result.scalar_one_or_none()
 
         if not user:
             raise InvalidCredentialsException()
 
-        password_valid = bcrypt.checkpw(
+        password_valid = await asyncio.get_running_loop().run_in_executor(
+            None,
+            bcrypt.checkpw,
             password.encode(),
             user.hashed_password.encode(),
         )
@@ -126,11 +298,11 @@ class AuthService:
         if not user.is_active:
             raise InvalidCredentialsException()
 
-        user.last_login_at = datetime.now(timezone.utc)
+        user.last_login_at = _now(_UTC)
 
         token, expires_in = self._generate_jwt(user)
 
-        logger.info(f"[Auth] Login exitoso: {email} (id={user.id})")
+        logger.info("[Auth] Login exitoso: %s (id=%s)", email, user.id)
 
         return UserLoginResponse(
             access_token = token,
@@ -142,16 +314,12 @@ class AuthService:
 
     def verify_token(self, token: str) -> CurrentUser:
         try:
-            payload = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=[JWT_ALGORITHM],
-            )
+            payload = self._jwt_decode(token)
             return CurrentUser(
                 user_id   = payload["sub"],
                 email     = payload["email"],
                 username  = payload["username"],
-                kyc_level = payload.get("kyc_level", "none"),
+                kyc_level = payload.get("kyc_level", KycLevel.NONE.value),
             )
         except jwt.ExpiredSignatureError:
             raise InvalidTokenException("Token expirado. Inicia sesión nuevamente.")
@@ -159,46 +327,61 @@ class AuthService:
             raise InvalidTokenException()
 
     def _generate_jwt(self, user: User) -> tuple[str, int]:
-        expires_in = JWT_EXPIRE_HOURS * 3600
-        expire     = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRE_HOURS)
+        # exp / iat como epoch int (lo que PyJWT serializa de todas formas)
+        now = int(time.time())
 
         payload = {
             "sub":       str(user.id),
             "email":     user.email,
             "username":  user.username,
             "kyc_level": user.kyc_level,
-            "exp":       expire,
-            "iat":       datetime.now(timezone.utc),
+            "exp":       now + JWT_EXPIRE_SECONDS,
+            "iat":       now,
         }
 
-        token = jwt.encode(payload, settings.SECRET_KEY, algorithm=JWT_ALGORITHM)
-        return token, expires_in
+        token = _jwt.encode(payload, self._jwt_key, algorithm=JWT_ALGORITHM)
+        return token, JWT_EXPIRE_SECONDS
 
     def _hash_cedula(self, cedula: str) -> bytes:
-        salted = f"{settings.SECRET_KEY}:{cedula}"
-        return hashlib.sha256(salted.encode()).digest()
+        # sha256(f"{SECRET_KEY}:{cedula}") — el prefijo ya está absorbido
+        # en self._cedula_hasher; solo se copia el estado y se agrega la cédula.
+        hasher = self._cedula_hasher.copy()
+        hasher.update(cedula.encode())
+        return hasher.digest()
 
-    async def _check_email_available(self, db: AsyncSession, email: str) -> None:
-        result = await db.execute(
-            select(User).where(User.email == email.lower())
-        )
-        if result.scalar_one_or_none():
-            raise EmailAlreadyExistsException()
+    async def _raise_conflict(
+        self,
+        db:          AsyncSession,
+        email:       str,
+        username:    str,
+        cedula_hash: bytes,
+    ) -> None:
+        """
+        Solo se llama cuando el INSERT de register no insertó nada:
+        averigua en una consulta qué UNIQUE chocó y lanza la excepción
+        correspondiente (prioridad email → username → cédula).
+        """
+        email    = email.lower()
+        username = username.lower()
+
+        # Tres EXISTS en una sola fila: cada uno resuelve con su índice
+        # UNIQUE y no se materializa ninguna fila de users.
+        email_taken, username_taken, cedula_taken = (await db.execute(
+            select(
+                exists().where(User.email       == email),
+                exists().where(User.username    == username),
+                exists().where(User.cedula_hash == cedula_hash),
+            )
+        )).one()
 
-    async def _check_username_available(self, db: AsyncSession, username: str) -> None:
-        result = await db.execute(
-            select(User).where(User.username == username.lower())
-        )
-        if result.scalar_one_or_none():
+        if email_taken:
+            raise EmailAlreadyExistsException()
+        if username_taken:
             raise UsernameAlreadyExistsException()
-
-    async def _check_cedula_available(self, db: AsyncSession, cedula: str) -> None:
-        cedula_hash = self._hash_cedula(cedula)
-        result = await db.execute(
-            select(User).where(User.cedula_hash == cedula_hash)
-        )
-        if result.scalar_one_or_none():
+        if cedula_taken:
             raise CedulaAlreadyExistsException()
+        # El registro en conflicto se borró entre el INSERT y esta consulta
+        raise FraudMotorException("No se pudo completar el registro. Intenta nuevamente.")
 
 
 auth_service = AuthService()
\ No newline at end of file
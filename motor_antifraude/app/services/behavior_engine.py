@@ -1,10 +1,14 @@
-import json
+import asyncio
 import logging
+import time
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Union
 
+import orjson
+from cachetools import TTLCache
 from redis.asyncio import Redis
+from redis.exceptions import ResponseError
 
 logger = logging.getLogger(__name__)
 
@@ -26,11 +30,93 @@ LEARNING_PERIOD_DAYS         = 30
 FAST_LOGIN_THRESHOLD_SECONDS = 30
 PROFILE_CHANGE_WINDOW_SEC    = 86400
 FREQUENT_RECIPIENT_MIN_TXS   = 3
+RECIPIENT_TTL_SEC            = 15_552_000   # 180 días
 AMOUNT_RATIO_HIGH            = 10.0
 AMOUNT_RATIO_MEDIUM          = 3.0
-
-
-@dataclass
+PROFILE_CACHE_MAXSIZE        = 50_000
+PROFILE_CACHE_TTL_SEC        = 5
+READ_BATCH_WINDOW_SEC        = 0.002
+READ_BATCH_MAX_SIZE          = 128
+
+# Días de quincena (1, 15, 16, 30, 31) como bits de un entero
+_PAYDAY_MASK = (1 << 1) | (1 << 15) | (1 << 16) | (1 << 30) | (1 << 31)
+
+# Reason codes precalculados: se indexan en lugar de formatear un str nuevo
+# en cada evaluación. Los ratios por encima de la tabla se formatean al vuelo.
+_UNUSUAL_HOUR_CODES = tuple(f"UNUSUAL_HOUR_{h}H" for h in range(24))
+_FIRST_WEEK_CODES   = tuple(f"FIRST_WEEK_USER_DAY_{d}" for d in range(7))
+_AMOUNT_RATIO_CODES = tuple(f"AMOUNT_{r}X_AVERAGE" for r in range(101))
+
+
+def _amount_ratio_code(ratio: float) -> str:
+    bucket = int(ratio)
+    if bucket < len(_AMOUNT_RATIO_CODES):
+        return _AMOUNT_RATIO_CODES[bucket]
+    return f"AMOUNT_{bucket}X_AVERAGE"
+
+
+# ── Perfil de comportamiento en Redis (HASH) ─────────────────────────
+# behavior:user:{user_id}:profile — lo escribe el worker nocturno con HSET:
+#   avg_amount, std_amount          float
+#   typical_hours_mask              int de 24 bits: bit h = hora h típica
+#   primary_currency                ISO 4217
+#   account_age_days                int
+#   last_profile_change_ts          epoch float (lo actualiza la app)
+#   last_login_ts                   epoch float (lo actualiza la app)
+# Perfiles anteriores guardados como JSON (string) se siguen leyendo
+# hasta que el worker los reescriba.
+PROFILE_FIELDS = (
+    "avg_amount",
+    "std_amount",
+    "typical_hours_mask",
+    "primary_currency",
+    "account_age_days",
+    "last_profile_change_ts",
+    "last_login_ts",
+)
+
+
+def _hours_to_mask(hours) -> int:
+    """[8, 9, 10] → entero con los bits 8, 9 y 10 encendidos."""
+    mask = 0
+    for h in hours:
+        mask |= 1 << int(h)
+    return mask
+
+
+# Horas típicas por defecto (8–22) si el perfil no las trae
+_DEFAULT_HOURS_MASK = _hours_to_mask(range(8, 23))
+
+# Actualiza un timestamp del perfil dentro de Redis: un solo round-trip
+# y atómico (no hay carrera entre leer y escribir).
+# KEYS[1] = perfil · ARGV = campo, timestamp.
+# HSET no toca la expiración; en perfiles JSON heredados KEEPTTL tampoco.
+# Si el perfil no existe no se crea (lo escribe el worker nocturno).
+_SET_PROFILE_TS_LUA = """
+local kind = redis.call('TYPE', KEYS[1]).ok
+if kind == 'hash' then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+elseif kind == 'string' then
+    local data = cjson.decode(redis.call('GET', KEYS[1]))
+    data[ARGV[1]] = tonumber(ARGV[2])
+    redis.call('SET', KEYS[1], cjson.encode(data), 'KEEPTTL')
+    return 1
+end
+return 0
+"""
+
+
+# ── Claves Redis (f-string: más rápido que str.format con nombre) ────
+def _profile_key(user_id: str) -> str:
+    return f"behavior:user:{user_id}:profile"
+
+
+def _recipient_key(user_id: str) -> str:
+    return f"behavior:user:{user_id}:recipients"
+
+
+@dataclass(slots=True)
 class BehaviorAnalysisResult:
     score: float
     reason_codes: list[str] = field(default_factory=list)
@@ -40,11 +126,11 @@ class BehaviorAnalysisResult:
     in_learning_period: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class UserBehaviorProfile:
     avg_transaction_amount: float
     std_transaction_amount: float
-    typical_hours: list
+    typical_hours_mask: int          # bit h encendido = hora h típica
     primary_currency: str
     account_age_days: int
     last_profile_change_ts: float
@@ -53,11 +139,23 @@ class UserBehaviorProfile:
 
 class BehaviorEngine:
 
-    PROFILE_KEY   = "behavior:user:{user_id}:profile"
-    RECIPIENT_KEY = "behavior:user:{user_id}:recipients"
-
     def __init__(self, redis_client: Redis):
         self.redis = redis_client
+        # EVALSHA con fallback automático a EVAL si el script no está cargado
+        self._set_profile_ts = redis_client.register_script(_SET_PROFILE_TS_LUA)
+        # Caché local de perfiles: ráfagas de txs del mismo usuario no
+        # vuelven a Redis. Se invalida al actualizar timestamps desde aquí.
+        self._profile_cache: TTLCache[str, UserBehaviorProfile] = TTLCache(
+            maxsize = PROFILE_CACHE_MAXSIZE,
+            ttl     = PROFILE_CACHE_TTL_SEC,
+        )
+        # Lecturas de perfil en curso por user_id (singleflight)
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Micro-batching de lecturas: (user_id, recipient_id, future)
+        # acumuladas durante READ_BATCH_WINDOW_SEC y enviadas en un pipeline
+        self._read_batch: list[tuple[str, Optional[str], asyncio.Future]] = []
+        self._read_batch_timer: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: set[asyncio.Task] = set()
 
     async def analyze(
         self,
@@ -66,32 +164,49 @@ class BehaviorEngine:
         currency: str,
         transaction_type: str,
         recipient_id: Optional[str] = None,
-        current_ts: Optional[datetime] = None,
+        current_ts: Union[float, datetime, None] = None,
     ) -> BehaviorAnalysisResult:
 
         result = BehaviorAnalysisResult(score=0.0)
-        now    = current_ts or datetime.now(timezone.utc)
+        # current_ts como epoch (float) o ausente: epoch + struct_time (UTC),
+        # sin construir ningún datetime. Se sigue aceptando un datetime.
+        if isinstance(current_ts, datetime):
+            now_ts       = current_ts.timestamp()
+            current_hour = current_ts.hour
+            current_day  = current_ts.day
+        else:
+            now_ts       = time.time() if current_ts is None else current_ts
+            now_tm       = time.gmtime(now_ts)
+            current_hour = now_tm.tm_hour
+            current_day  = now_tm.tm_mday
+
+        # Perfil + conteo del destinatario en un solo round-trip a Redis
+        is_p2p = transaction_type == "P2P_SEND" and bool(recipient_id)
+        profile, tx_count = await self._fetch_state(
+            user_id, recipient_id if is_p2p else None
+        )
 
-        profile = await self._get_profile(user_id)
+        # Usuario sin perfil: sus timestamps serían 0, no hay nada más que evaluar
+        if profile is None:
+            result.in_learning_period = True
+            result.score = max(0.0, min(100.0, REDUCTION_LEARNING_PERIOD))
+            result.reason_codes.append("LEARNING_PERIOD_ACTIVE")
+            return result
 
-        in_learning = (
-            profile is None
-            or profile.account_age_days < LEARNING_PERIOD_DAYS
-        )
+        in_learning = profile.account_age_days < LEARNING_PERIOD_DAYS
         if in_learning:
             result.in_learning_period = True
             result.score += REDUCTION_LEARNING_PERIOD
             result.reason_codes.append("LEARNING_PERIOD_ACTIVE")
-            profile = profile or self._default_profile()
 
         if profile.last_profile_change_ts > 0:
-            seconds_since_change = now.timestamp() - profile.last_profile_change_ts
+            seconds_since_change = now_ts - profile.last_profile_change_ts
             if 0 < seconds_since_change < PROFILE_CHANGE_WINDOW_SEC:
                 result.score += PENALTY_PROFILE_CHANGE_24H
                 result.reason_codes.append("PROFILE_CHANGED_LAST_24H")
 
         if profile.last_login_ts > 0:
-            seconds_since_login = now.timestamp() - profile.last_login_ts
+            seconds_since_login = now_ts - profile.last_login_ts
             if 0 < seconds_since_login < FAST_LOGIN_THRESHOLD_SECONDS:
                 result.score += PENALTY_FAST_LOGIN_TX
                 result.reason_codes.append(
@@ -102,11 +217,10 @@ class BehaviorEngine:
             result.score = max(0.0, min(100.0, result.score))
             return result
 
-        current_hour = now.hour
-        if profile.typical_hours and current_hour not in profile.typical_hours:
+        if profile.typical_hours_mask and not (profile.typical_hours_mask >> current_hour) & 1:
             result.is_unusual_hour = True
             result.score += PENALTY_UNUSUAL_HOUR
-            result.reason_codes.append(f"UNUSUAL_HOUR_{current_hour}H")
+            result.reason_codes.append(_UNUSUAL_HOUR_CODES[current_hour])
 
         if profile.avg_transaction_amount > 0:
             ratio = amount / profile.avg_transaction_amount
@@ -114,15 +228,15 @@ class BehaviorEngine:
 
             if ratio > AMOUNT_RATIO_HIGH:
                 result.score += PENALTY_AMOUNT_10X_AVERAGE
-                result.reason_codes.append(f"AMOUNT_{int(ratio)}X_AVERAGE")
+                result.reason_codes.append(_amount_ratio_code(ratio))
 
             elif ratio > AMOUNT_RATIO_MEDIUM:
-                if self._is_payday_window(now):
+                if (_PAYDAY_MASK >> current_day) & 1:
                     result.score += REDUCTION_PAYDAY_WINDOW
                     result.reason_codes.append("PAYDAY_WINDOW_REDUCTION")
                 else:
                     result.score += PENALTY_AMOUNT_3X_AVERAGE
-                    result.reason_codes.append(f"AMOUNT_{int(ratio)}X_AVERAGE")
+                    result.reason_codes.append(_amount_ratio_code(ratio))
 
         if profile.primary_currency and currency != profile.primary_currency:
             result.score += PENALTY_CURRENCY_CHANGE
@@ -133,11 +247,12 @@ class BehaviorEngine:
         if profile.account_age_days < 7:
             result.score += PENALTY_FIRST_WEEK_USER
             result.reason_codes.append(
-                f"FIRST_WEEK_USER_DAY_{profile.account_age_days}"
+                _FIRST_WEEK_CODES[profile.account_age_days]
+                if profile.account_age_days >= 0
+                else f"FIRST_WEEK_USER_DAY_{profile.account_age_days}"
             )
 
-        if transaction_type == "P2P_SEND" and recipient_id:
-            tx_count = await self._get_recipient_tx_count(user_id, recipient_id)
+        if is_p2p:
             result.is_new_recipient = tx_count == 0
 
             if tx_count == 0:
@@ -153,47 +268,191 @@ class BehaviorEngine:
         result.score = max(0.0, min(100.0, result.score))
 
         logger.debug(
-            f"[Behavior] user={user_id}  score={result.score:.1f}  "
-            f"amount_ratio={result.amount_vs_average_ratio:.1f}x  "
-            f"codes={result.reason_codes}"
+            "[Behavior] user=%s  score=%.1f  amount_ratio=%.1fx  codes=%s",
+            user_id, result.score, result.amount_vs_average_ratio,
+            result.reason_codes,
         )
         return result
 
-    def _is_payday_window(self, dt: datetime) -> bool:
-        return dt.day in {1, 15, 16, 30, 31}
+    async def _fetch_state(
+        self, user_id: str, recipient_id: Optional[str]
+    ) -> tuple[Optional[UserBehaviorProfile], int]:
+        """
+        Lee el perfil (HMGET de los campos que usa analyze) y, si hay
+        destinatario P2P, su conteo de txs en un único pipeline (sin MULTI)
+        compartido con las demás lecturas de la misma ventana de batching.
+        Si el perfil está en la caché local o ya hay una lectura en curso
+        para el mismo usuario, solo se consulta el conteo del destinatario.
+        """
+        profile = self._profile_cache.get(user_id)
+        if profile is None:
+            inflight = self._inflight.get(user_id)
+            if inflight is not None:
+                # Otra tx del mismo usuario ya está leyendo el perfil: se
+                # espera su resultado en vez de repetir la lectura
+                profile = await asyncio.shield(inflight)
+            else:
+                return await self._fetch_state_from_redis(user_id, recipient_id)
+
+        if not recipient_id:
+            return profile, 0
+        return profile, await self._get_recipient_count(user_id, recipient_id)
+
+    async def _fetch_state_from_redis(
+        self, user_id: str, recipient_id: Optional[str]
+    ) -> tuple[Optional[UserBehaviorProfile], int]:
+        inflight = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = inflight
+        profile: Optional[UserBehaviorProfile] = None
+        try:
+            key = _profile_key(user_id)
+            try:
+                replies = await self._read_batched(user_id, recipient_id)
+            except Exception as e:
+                logger.error(
+                    "[Behavior] Error leyendo estado user=%s: %s",
+                    user_id, e,
+                )
+                return None, 0
+
+            raw_profile = replies[0]
+            if isinstance(raw_profile, ResponseError):
+                # WRONGTYPE → perfil JSON heredado (string), un GET extra
+                profile = await self._get_legacy_profile(user_id, key)
+            else:
+                profile = self._parse_profile(user_id, raw_profile)
+            if profile is not None:
+                self._profile_cache[user_id] = profile
+
+            raw_count = replies[1] if recipient_id else None
+            if isinstance(raw_count, Exception):
+                logger.error(
+                    "[Behavior] Error leyendo recipient count: %s",
+                    raw_count,
+                )
+                raw_count = None
+
+            return profile, int(raw_count) if raw_count else 0
+        finally:
+            # Aunque la lectura falle o se cancele, los que esperan reciben
+            # un resultado (None = sin perfil) y nunca una excepción
+            self._inflight.pop(user_id, None)
+            inflight.set_result(profile)
+
+    async def _read_batched(
+        self, user_id: str, recipient_id: Optional[str]
+    ) -> list:
+        """
+        Encola la lectura (HMGET del perfil + HGET del destinatario) y
+        espera a que salga en el siguiente pipeline. Devuelve las
+        respuestas crudas en el mismo orden que antes: [perfil, conteo?].
+        """
+        loop = asyncio.get_running_loop()
+        fut  = loop.create_future()
+        self._read_batch.append((user_id, recipient_id, fut))
+
+        if len(self._read_batch) >= READ_BATCH_MAX_SIZE:
+            self._flush_read_batch()
+        elif self._read_batch_timer is None:
+            self._read_batch_timer = loop.call_later(
+                READ_BATCH_WINDOW_SEC, self._flush_read_batch
+            )
+        return await fut
+
+    def _flush_read_batch(self) -> None:
+        if self._read_batch_timer is not None:
+            self._read_batch_timer.cancel()
+            self._read_batch_timer = None
+        batch, self._read_batch = self._read_batch, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._execute_read_batch(batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _execute_read_batch(
+        self, batch: list[tuple[str, Optional[str], asyncio.Future]]
+    ) -> None:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id, recipient_id, _ in batch:
+                pipe.hmget(_profile_key(user_id), *PROFILE_FIELDS)
+                if recipient_id:
+                    pipe.hget(_recipient_key(user_id), recipient_id)
+            replies = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        pos = 0
+        for _, recipient_id, fut in batch:
+            size = 2 if recipient_id else 1
+            if not fut.done():   # el que esperaba pudo haberse cancelado
+                fut.set_result(replies[pos:pos + size])
+            pos += size
 
-    async def _get_profile(self, user_id: str) -> Optional[UserBehaviorProfile]:
-        key = self.PROFILE_KEY.format(user_id=user_id)
+    async def _get_recipient_count(self, user_id: str, recipient_id: str) -> int:
+        try:
+            raw_count = await self.redis.hget(_recipient_key(user_id), recipient_id)
+            return int(raw_count) if raw_count else 0
+        except Exception as e:
+            logger.error("[Behavior] Error leyendo recipient count: %s", e)
+            return 0
+
+    def _parse_profile(
+        self, user_id: str, values: list[Optional[bytes]]
+    ) -> Optional[UserBehaviorProfile]:
+        (avg_amount, std_amount, typical_hours_mask, primary_currency,
+         account_age_days, last_profile_change_ts, last_login_ts) = values
+
+        if all(v is None for v in values):
+            return None   # el hash no existe
+        try:
+            return UserBehaviorProfile(
+                avg_transaction_amount = float(avg_amount or 0.0),
+                std_transaction_amount = float(std_amount or 0.0),
+                typical_hours_mask     = (
+                    int(typical_hours_mask)
+                    if typical_hours_mask is not None else _DEFAULT_HOURS_MASK
+                ),
+                primary_currency       = (
+                    primary_currency.decode() if primary_currency else "MXN"
+                ),
+                account_age_days       = int(account_age_days or 0),
+                last_profile_change_ts = float(last_profile_change_ts or 0.0),
+                last_login_ts          = float(last_login_ts or 0.0),
+            )
+        except Exception as e:
+            logger.error("[Behavior] Error leyendo perfil user=%s: %s", user_id, e)
+            return None
+
+    async def _get_legacy_profile(
+        self, user_id: str, key: str
+    ) -> Optional[UserBehaviorProfile]:
         try:
             raw = await self.redis.get(key)
             if not raw:
                 return None
 
-            data = json.loads(raw)
+            data = orjson.loads(raw)   # bytes directo, sin .decode()
             return UserBehaviorProfile(
                 avg_transaction_amount = data.get("avg_amount", 0.0),
                 std_transaction_amount = data.get("std_amount", 0.0),
-                typical_hours          = data.get("typical_hours", list(range(8, 23))),
+                typical_hours_mask     = (
+                    _hours_to_mask(data["typical_hours"])
+                    if "typical_hours" in data else _DEFAULT_HOURS_MASK
+                ),
                 primary_currency       = data.get("primary_currency", "MXN"),
                 account_age_days       = data.get("account_age_days", 0),
                 last_profile_change_ts = data.get("last_profile_change_ts", 0.0),
                 last_login_ts          = data.get("last_login_ts", 0.0),
             )
         except Exception as e:
-            logger.error(f"[Behavior] Error leyendo perfil user={user_id}: {e}")
+            logger.error("[Behavior] Error leyendo perfil user=%s: %s", user_id, e)
             return None
 
-    async def _get_recipient_tx_count(
-        self, user_id: str, recipient_id: str
-    ) -> int:
-        key = self.RECIPIENT_KEY.format(user_id=user_id)
-        try:
-            raw = await self.redis.hget(key, recipient_id)
-            return int(raw) if raw else 0
-        except Exception as e:
-            logger.error(f"[Behavior] Error leyendo recipient count: {e}")
-            return 0
-
     async def record_successful_tx(
         self,
         user_id: str,
@@ -203,50 +462,42 @@ class BehaviorEngine:
     ) -> None:
         if not recipient_id:
             return
-        key = self.RECIPIENT_KEY.format(user_id=user_id)
+        key = _recipient_key(user_id)
         try:
-            await self.redis.hincrby(key, recipient_id, 1)
-            await self.redis.expire(key, 60 * 60 * 24 * 180)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hincrby(key, recipient_id, 1)
+            pipe.expire(key, RECIPIENT_TTL_SEC)
+            await pipe.execute()
         except Exception as e:
             logger.error(
-                f"[Behavior] Error registrando tx exitosa user={user_id}: {e}"
+                "[Behavior] Error registrando tx exitosa user=%s: %s",
+                user_id, e,
             )
 
     async def update_login_timestamp(self, user_id: str) -> None:
-        key = self.PROFILE_KEY.format(user_id=user_id)
+        self._profile_cache.pop(user_id, None)
+        key = _profile_key(user_id)
         try:
-            raw = await self.redis.get(key)
-            if raw:
-                data = json.loads(raw)
-                data["last_login_ts"] = datetime.now(timezone.utc).timestamp()
-                await self.redis.setex(key, 300, json.dumps(data))
+            await self._set_profile_ts(
+                keys = [key],
+                args = ["last_login_ts", time.time()],
+            )
         except Exception as e:
             logger.error(
-                f"[Behavior] Error actualizando login ts user={user_id}: {e}"
+                "[Behavior] Error actualizando login ts user=%s: %s",
+                user_id, e,
             )
 
     async def update_profile_change_timestamp(self, user_id: str) -> None:
-        key = self.PROFILE_KEY.format(user_id=user_id)
+        self._profile_cache.pop(user_id, None)
+        key = _profile_key(user_id)
         try:
-            raw = await self.redis.get(key)
-            if raw:
-                data = json.loads(raw)
-                data["last_profile_change_ts"] = (
-                    datetime.now(timezone.utc).timestamp()
-                )
-                await self.redis.setex(key, 300, json.dumps(data))
+            await self._set_profile_ts(
+                keys = [key],
+                args = ["last_profile_change_ts", time.time()],
+            )
         except Exception as e:
             logger.error(
-                f"[Behavior] Error actualizando profile change ts user={user_id}: {e}"
+                "[Behavior] Error actualizando profile change ts user=%s: %s",
+                user_id, e,
             )
-
-    def _default_profile(self) -> UserBehaviorProfile:
-        return UserBehaviorProfile(
-            avg_transaction_amount = 0.0,
-            std_transaction_amount = 0.0,
-            typical_hours          = list(range(7, 23)),
-            primary_currency       = "MXN",
-            account_age_days       = 0,
-            last_profile_change_ts = 0.0,
-            last_login_ts          = 0.0,
-        )
\ No newline at end of file
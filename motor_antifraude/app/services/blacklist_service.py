@@ -1,9 +1,10 @@
 import logging
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from typing import Optional, Sequence
 
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +18,7 @@ class BlacklistType(str, Enum):
     PHONE  = "phone"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class BlacklistHit:
     hit: bool
     blacklist_type: Optional[BlacklistType] = None
@@ -25,9 +26,84 @@ class BlacklistHit:
     added_by: Optional[str] = None
 
 
+# Inmutable: el mismo resultado "sin hit" se comparte entre todas las llamadas
+_NO_HIT = BlacklistHit(hit=False)
+
+# Prefijos de clave precalculados con el .value del tipo:
+# "blacklist:user:", "blacklist:device:", ... Todas las operaciones arman
+# la clave como _PREFIXES[tipo] + valor, sin formatear ni tocar .value.
+_KEY_PREFIX = "blacklist"
+_PREFIXES   = {t: f"{_KEY_PREFIX}:{t.value}:" for t in BlacklistType}
+
+_BASE_TYPES = (
+    BlacklistType.USER,
+    BlacklistType.DEVICE,
+    BlacklistType.IP,
+    BlacklistType.BIN,
+)
+_BASE_PREFIXES = tuple(_PREFIXES[t] for t in _BASE_TYPES)
+_EMAIL_PREFIX  = _PREFIXES[BlacklistType.EMAIL]
+_PHONE_PREFIX  = _PREFIXES[BlacklistType.PHONE]
+
+# Tuplas de tipos ya armadas según haya email / teléfono: check() no toca
+# miembros del Enum ni crea listas de tipos por llamada
+_TYPES_BY_EXTRA = {
+    (False, False): _BASE_TYPES,
+    (True,  False): _BASE_TYPES + (BlacklistType.EMAIL,),
+    (False, True):  _BASE_TYPES + (BlacklistType.PHONE,),
+    (True,  True):  _BASE_TYPES + (BlacklistType.EMAIL, BlacklistType.PHONE),
+}
+
+
+def _build_keys(
+    user_id: str,
+    device_id: str,
+    ip_address: str,
+    card_bin: str,
+    email: Optional[str],
+    phone: Optional[str],
+) -> tuple[list[str], tuple[BlacklistType, ...]]:
+    key_list  = [
+        prefix + value
+        for prefix, value in zip(
+            _BASE_PREFIXES, (user_id, device_id, ip_address, card_bin)
+        )
+    ]
+    if email:
+        key_list.append(_EMAIL_PREFIX + email)
+    if phone:
+        key_list.append(_PHONE_PREFIX + phone)
+
+    return key_list, _TYPES_BY_EXTRA[bool(email), bool(phone)]
+
+
+def _first_hit(
+    type_list: Sequence[BlacklistType], results: Sequence[Optional[bytes]]
+) -> BlacklistHit:
+    # Caso común (ninguna clave existe): list.count recorre en C, sin bucle Python
+    if results.count(None) == len(results):
+        return _NO_HIT
+
+    for i, value in enumerate(results):
+        if value is not None:
+            bl_type    = type_list[i]
+            reason_str = value.decode()   # decode_responses=False → bytes
+            logger.warning(
+                "[Blacklist] HIT — type=%s  reason=%s",
+                bl_type.value, reason_str,
+            )
+            return BlacklistHit(
+                hit=True,
+                blacklist_type=bl_type,
+                reason=reason_str,
+                added_by="system",
+            )
+
+    return _NO_HIT
+
+
 class BlacklistService:
 
-    KEY_PREFIX = "blacklist"
     TEMP_BLOCK_TTL = 60 * 60 * 24
 
     def __init__(self, redis_client: Redis):
@@ -42,48 +118,21 @@ class BlacklistService:
         email: Optional[str] = None,
         phone: Optional[str] = None,
     ) -> BlacklistHit:
-        keys = {
-            BlacklistType.USER:   f"{self.KEY_PREFIX}:{BlacklistType.USER}:{user_id}",
-            BlacklistType.DEVICE: f"{self.KEY_PREFIX}:{BlacklistType.DEVICE}:{device_id}",
-            BlacklistType.IP:     f"{self.KEY_PREFIX}:{BlacklistType.IP}:{ip_address}",
-            BlacklistType.BIN:    f"{self.KEY_PREFIX}:{BlacklistType.BIN}:{card_bin}",
-        }
-
-        if email:
-            keys[BlacklistType.EMAIL] = (
-                f"{self.KEY_PREFIX}:{BlacklistType.EMAIL}:{email}"
-            )
-        if phone:
-            keys[BlacklistType.PHONE] = (
-                f"{self.KEY_PREFIX}:{BlacklistType.PHONE}:{phone}"
-            )
-
-        key_list  = list(keys.values())
-        type_list = list(keys.keys())
+        key_list, type_list = _build_keys(
+            user_id, device_id, ip_address, card_bin, email, phone
+        )
 
         try:
+            # Caso común (sin hits): EXISTS devuelve un entero, sin payloads.
+            # Solo si algo existe se leen las razones con MGET.
+            if not await self.redis.exists(*key_list):
+                return _NO_HIT
             results = await self.redis.mget(*key_list)
-        except Exception as e:
-            logger.error(f"[Blacklist] Redis error durante mget: {e}")
-            return BlacklistHit(hit=False)
-
-        for bl_type, value in zip(type_list, results):
-            if value is not None:
-                reason_str = (
-                    value.decode() if isinstance(value, bytes) else str(value)
-                )
-                logger.warning(
-                    f"[Blacklist] HIT — "
-                    f"type={bl_type.value}  reason={reason_str}"
-                )
-                return BlacklistHit(
-                    hit=True,
-                    blacklist_type=bl_type,
-                    reason=reason_str,
-                    added_by="system",
-                )
+        except RedisError as e:
+            logger.error("[Blacklist] Redis error durante check: %s", e)
+            return _NO_HIT
 
-        return BlacklistHit(hit=False)
+        return _first_hit(type_list, results)
 
     async def add(
         self,
@@ -93,7 +142,7 @@ class BlacklistService:
         temporary: bool = False,
         ttl_seconds: int = TEMP_BLOCK_TTL,
     ) -> bool:
-        key = f"{self.KEY_PREFIX}:{bl_type.value}:{value}"
+        key = _PREFIXES[bl_type] + value
         try:
             if temporary:
                 await self.redis.setex(key, ttl_seconds, reason)
@@ -101,45 +150,45 @@ class BlacklistService:
                 await self.redis.set(key, reason)
 
             logger.info(
-                f"[Blacklist] Entrada agregada — "
-                f"type={bl_type.value}  value={value}  reason={reason}  "
-                f"temporary={temporary}"
+                "[Blacklist] Entrada agregada — "
+                "type=%s  value=%s  reason=%s  temporary=%s",
+                bl_type.value, value, reason, temporary,
             )
             return True
 
-        except Exception as e:
-            logger.error(f"[Blacklist] Error al agregar entrada: {e}")
+        except RedisError as e:
+            logger.error("[Blacklist] Error al agregar entrada: %s", e)
             return False
 
     async def remove(self, bl_type: BlacklistType, value: str) -> bool:
-        key = f"{self.KEY_PREFIX}:{bl_type.value}:{value}"
+        key = _PREFIXES[bl_type] + value
         try:
             deleted = await self.redis.delete(key)
             if deleted:
                 logger.info(
-                    f"[Blacklist] Entrada eliminada — "
-                    f"type={bl_type.value}  value={value}"
+                    "[Blacklist] Entrada eliminada — type=%s  value=%s",
+                    bl_type.value, value,
                 )
             return deleted > 0
 
-        except Exception as e:
-            logger.error(f"[Blacklist] Error al eliminar entrada: {e}")
+        except RedisError as e:
+            logger.error("[Blacklist] Error al eliminar entrada: %s", e)
             return False
 
     async def is_blocked(self, bl_type: BlacklistType, value: str) -> bool:
-        key = f"{self.KEY_PREFIX}:{bl_type.value}:{value}"
+        key = _PREFIXES[bl_type] + value
         try:
             return await self.redis.exists(key) > 0
-        except Exception as e:
-            logger.error(f"[Blacklist] Error al verificar entrada: {e}")
+        except RedisError as e:
+            logger.error("[Blacklist] Error al verificar entrada: %s", e)
             return False
 
     async def get_reason(self, bl_type: BlacklistType, value: str) -> Optional[str]:
-        key = f"{self.KEY_PREFIX}:{bl_type.value}:{value}"
+        key = _PREFIXES[bl_type] + value
         try:
             raw = await self.redis.get(key)
             if raw:
-                return raw.decode() if isinstance(raw, bytes) else str(raw)
-        except Exception as e:
-            logger.error(f"[Blacklist] Error al obtener razón: {e}")
+                return raw.decode()
+        except RedisError as e:
+            logger.error("[Blacklist] Error al obtener razón: %s", e)
         return None
\ No newline at end of file
@@ -10,7 +10,7 @@ histórico de 30 días). Este módulo detecta el ataque activo
 en tiempo real dentro de la misma hora, por BIN específico.
 
 Redis:
-  card_test:{device_id}:{card_bin}:amounts → LIST de montos (últimas 10 tx, 1hr)
+  card_test:{device_id}:{card_bin}:probes  → ZSET de micro-tx (score = ts, 1hr)
   card_test:{card_bin}:rate_10min          → COUNTER de requests en 10min
 """
 
@@ -18,11 +18,14 @@ import logging
 import time
 from dataclasses import dataclass, field
 
+from redis.exceptions import RedisError
+
 from app.infrastructure.cache.redis_client import redis_manager
 
 logger = logging.getLogger(__name__)
 
-_AMOUNTS_TTL    = 3_600   # 1 hora
+_PROBE_WINDOW   = 3_600   # 1 hora de ventana para micro-transacciones
+_PROBE_MAX_KEPT = 50      # tope de micro-tx guardadas por (device, BIN)
 _RATE_TTL       = 600     # 10 minutos
 _PROBE_THRESHOLD = 3      # mínimo N micro-transacciones para activar la regla
 _PROBE_MAX_AMOUNT = 10.0  # monto máximo para considerar "micro-transacción"
@@ -30,7 +33,36 @@ _LARGE_THRESHOLD  = 200.0 # monto que activa el flag si viene después de micros
 _RAPID_THRESHOLD  = 5     # 5+ transacciones en 10min con el mismo BIN
 
 
-@dataclass
+# Todo en un solo EVALSHA. KEYS[1] es un ZSET (score = unix ts) que guarda
+# solo las micro-transacciones de la última hora; KEYS[2] el contador del BIN.
+#   ARGV[1] ts actual   ARGV[2] miembro único   ARGV[3] ventana (s)
+#   ARGV[4] TTL rate    ARGV[5] "1" si es micro  ARGV[6] "1" si es grande
+#   ARGV[7] tope de micro-tx guardadas
+# Para un monto grande se purgan las entradas vencidas y ZCARD da el conteo.
+# Devuelve {rapid_count, micro_count}.
+_CHECK_LUA = """
+local cutoff = tonumber(ARGV[1]) - tonumber(ARGV[3])
+
+local rate = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+
+local micro = 0
+if ARGV[6] == '1' then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', cutoff)
+    micro = redis.call('ZCARD', KEYS[1])
+end
+
+if ARGV[5] == '1' then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', cutoff)
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[7]) + 1))
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return {rate, micro}
+"""
+
+
+@dataclass(slots=True)
 class CardTestingResult:
     penalty:      int       = 0
     reason_codes: list[str] = field(default_factory=list)
@@ -38,11 +70,22 @@ class CardTestingResult:
 
 class CardTestingDetector:
     """
-    Mantiene una ventana deslizante de montos por (device_id, card_bin)
-    para detectar el patrón micro → grande (card testing) y ataques
+    Mantiene una ventana deslizante de 1 hora con las micro-transacciones
+    de cada (device_id, card_bin) para detectar el patrón micro → grande (card testing) y ataques
     rápidos de carding.
     """
 
+    def __init__(self):
+        self._script        = None
+        self._script_client = None
+
+    def _get_script(self, redis):
+        # Se registra contra el cliente vigente (se recrea si Redis reconecta)
+        if self._script is None or self._script_client is not redis:
+            self._script        = redis.register_script(_CHECK_LUA)
+            self._script_client = redis
+        return self._script
+
     async def check(
         self,
         device_id: str,
@@ -51,21 +94,21 @@ class CardTestingDetector:
     ) -> CardTestingResult:
         result    = CardTestingResult()
         redis     = redis_manager.client
-        amounts_key = f"card_test:{device_id}:{card_bin}:amounts"
-        rate_key    = f"card_test:{card_bin}:rate_10min"
+        probes_key = f"card_test:{device_id}:{card_bin}:probes"
+        rate_key   = f"card_test:{card_bin}:rate_10min"
 
         try:
-            pipe = redis.pipeline()
-            # Agregar monto actual al histórico de la ventana
-            pipe.lpush(amounts_key, str(amount))
-            pipe.ltrim(amounts_key, 0, 9)        # solo últimas 10 transacciones
-            pipe.expire(amounts_key, _AMOUNTS_TTL)
-            # Contador rápido por BIN en 10min
-            pipe.incr(rate_key)
-            pipe.expire(rate_key, _RATE_TTL)
-            results = await pipe.execute()
-
-            rapid_count = results[3]  # valor del INCR
+            now_ns   = time.time_ns()
+            is_large = amount >= _LARGE_THRESHOLD
+            rapid_count, micro_count = await self._get_script(redis)(
+                keys = [probes_key, rate_key],
+                args = [
+                    now_ns / 1e9, now_ns, _PROBE_WINDOW, _RATE_TTL,
+                    "1" if amount <= _PROBE_MAX_AMOUNT else "0",
+                    "1" if is_large else "0",
+                    _PROBE_MAX_KEPT,
+                ],
+            )
 
             # ── Regla 1: Carding rápido (muchos requests al mismo BIN) ──
             if rapid_count >= _RAPID_THRESHOLD:
@@ -74,33 +117,24 @@ class CardTestingDetector:
                     f"RAPID_BIN_PROBE_{rapid_count}_IN_10MIN"
                 )
                 logger.warning(
-                    f"[CardTesting] Rapid probe card_bin={card_bin} "
-                    f"count={rapid_count}"
+                    "[CardTesting] Rapid probe card_bin=%s count=%d",
+                    card_bin, rapid_count,
                 )
 
             # ── Regla 2: Micro → Grande (card testing clásico) ──────────
-            if amount >= _LARGE_THRESHOLD:
-                # Obtener el historial (sin el monto actual que acabamos de pushear)
-                raw_amounts = await redis.lrange(amounts_key, 1, -1)
-                prev_amounts = [float(a) for a in raw_amounts if a]
-
-                if len(prev_amounts) >= _PROBE_THRESHOLD:
-                    micro_count = sum(
-                        1 for a in prev_amounts if a <= _PROBE_MAX_AMOUNT
-                    )
-                    if micro_count >= _PROBE_THRESHOLD:
-                        result.penalty += 40
-                        result.reason_codes.append(
-                            f"CARD_TESTING_PATTERN_{micro_count}_PROBES"
-                        )
-                        logger.warning(
-                            f"[CardTesting] Pattern detected device={device_id} "
-                            f"bin={card_bin} probes={micro_count} "
-                            f"large_amount={amount}"
-                        )
-
-        except Exception as e:
-            logger.error(f"[CardTesting] Redis error: {e}")
+            if is_large and micro_count >= _PROBE_THRESHOLD:
+                result.penalty += 40
+                result.reason_codes.append(
+                    f"CARD_TESTING_PATTERN_{micro_count}_PROBES"
+                )
+                logger.warning(
+                    "[CardTesting] Pattern detected device=%s bin=%s "
+                    "probes=%d large_amount=%s",
+                    device_id, card_bin, micro_count, amount,
+                )
+
+        except RedisError as e:
+            logger.error("[CardTesting] Redis error: %s", e)
 
         return result
 
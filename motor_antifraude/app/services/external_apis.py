@@ -21,21 +21,75 @@ Límites del plan gratuito de ip-api.com:
   - En producción: MaxMind GeoLite2 o ip-api.com Pro
 """
 
+import asyncio
+import functools
+import ipaddress
 import logging
 from dataclasses import dataclass
-from typing import Optional
+from typing import Awaitable, Callable, Optional, TypeVar
 import httpx
+import orjson
+from cachetools import TTLCache
+from redis.exceptions import RedisError
 from app.infrastructure.cache.redis_client import redis_manager
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 GEOIP_TIMEOUT_SEC  = 2.0  
 BIN_TIMEOUT_SEC    = 2.0   
 
 GEOIP_CACHE_TTL    = 60 * 60 * 6    
 BIN_CACHE_TTL      = 60 * 60 * 24   
 
-@dataclass
+# Caché L1 en proceso delante de Redis (IPs / BINs más frecuentes).
+# TTL corto e independiente del de Redis: una entrada copiada desde Redis
+# no conoce el TTL que le queda a la clave, así que como mucho se sirve
+# L1_CACHE_TTL más allá de la ventana de Redis (no 6 h / 24 h extra).
+L1_CACHE_MAXSIZE   = 10_000
+L1_CACHE_TTL       = 60 * 5
+BIN_NOT_FOUND_TTL  = 30
+
+# Límites del pool HTTP de cada cliente: una conexión keep-alive por host
+# se reutiliza entre lookups en vez de abrir TCP/TLS cada vez
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+
+
+async def _singleflight(
+    inflight: dict[str, asyncio.Future],
+    key:      str,
+    fetch:    Callable[[], Awaitable[T]],
+    default:  T,
+) -> T:
+    """
+    Una sola llamada a la API por clave a la vez: los lookups concurrentes
+    de la misma IP/BIN esperan el resultado del primero. Si la llamada
+    falla o se cancela, los que esperan reciben `default`.
+    """
+    pending = inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    inflight[key] = future
+    result = default
+    try:
+        result = await fetch()
+        return result
+    finally:
+        inflight.pop(key, None)
+        future.set_result(result)
+
+
+async def close_http_client() -> None:
+    """Cierra los pools HTTP de ambos clientes (lifespan de la app)."""
+    try:
+        await geoip_client.close()
+    finally:
+        await bin_lookup_client.close()
+
+@dataclass(slots=True, frozen=True)
 class GeoIPResult:
 
     ip_country:   str            
@@ -59,41 +113,85 @@ _GEO_DEFAULT = GeoIPResult(
     success    = False,
 )
 
+# Resultado fijo para IPs privadas/loopback (tráfico local y de pruebas)
+_GEO_LOCAL = GeoIPResult(
+    ip_country = "MX",
+    ip_city    = "Local",
+    ip_isp     = "Local",
+    is_vpn     = False,
+    is_hosting = False,
+    latitude   = 19.4326,
+    longitude  = -99.1332,
+    success    = True,
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_private_ip(ip: str) -> bool:
+    """IP privada, loopback o link-local (IPv4/IPv6); texto inválido → False."""
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return addr.is_private or addr.is_loopback
+
 
 class GeoIPClient:
 
-    API_URL    = "http://ip-api.com/json/{ip}"
+    BASE_URL   = "http://ip-api.com"
+    API_PATH   = "/json/{ip}"
     FIELDS     = "status,country,countryCode,city,isp,proxy,hosting,lat,lon"
     CACHE_KEY  = "geo:ip:{ip}"
 
+    def __init__(self):
+        # ip-api.com gratuito es HTTP plano: HTTP/1.1 con keep-alive
+        self._client = httpx.AsyncClient(
+            base_url  = self.BASE_URL,
+            timeout   = GEOIP_TIMEOUT_SEC,
+            transport = httpx.AsyncHTTPTransport(retries=0, limits=_HTTP_LIMITS),
+        )
+        self._local: TTLCache[str, GeoIPResult] = TTLCache(
+            maxsize = L1_CACHE_MAXSIZE,
+            ttl     = L1_CACHE_TTL,
+        )
+        # Llamadas HTTP en curso por IP (singleflight)
+        self._inflight: dict[str, asyncio.Future] = {}
+
     async def lookup(self, ip_address: str) -> GeoIPResult:
-        
         if self._is_private_ip(ip_address):
-            logger.debug(f"[GeoIP] IP privada detectada: {ip_address}")
-            return GeoIPResult(
-                ip_country = "MX",  
-                ip_city    = "Local",
-                ip_isp     = "Local",
-                is_vpn     = False,
-                is_hosting = False,
-                latitude   = 19.4326,
-                longitude  = -99.1332,
-                success    = True,
-            )
-
-        cached = await self._get_cache(ip_address)
+            logger.debug("[GeoIP] IP privada detectada: %s", ip_address)
+            return _GEO_LOCAL
+
+        local = self._local.get(ip_address)
+        if local:
+            return local
+        return await self.resolve(ip_address, await self._get_cache(ip_address))
+
+    async def resolve(
+        self, ip_address: str, cached: Optional[GeoIPResult]
+    ) -> GeoIPResult:
+        """Completa el lookup con la caché ya leída: si no hubo hit, va a la API."""
         if cached:
+            # Sin renovar el TTL (L1_CACHE_TTL) de una entrada L1 que ya existe
+            if ip_address not in self._local:
+                self._local[ip_address] = cached
             return cached
 
+        return await _singleflight(
+            self._inflight, ip_address, lambda: self._fetch(ip_address), _GEO_DEFAULT
+        )
+
+    async def _fetch(self, ip_address: str) -> GeoIPResult:
         try:
-            async with httpx.AsyncClient(timeout=GEOIP_TIMEOUT_SEC) as client:
-                url      = self.API_URL.format(ip=ip_address)
-                response = await client.get(url, params={"fields": self.FIELDS})
-                response.raise_for_status()
-                data = response.json()
+            response = await self._client.get(
+                self.API_PATH.format(ip=ip_address),
+                params = {"fields": self.FIELDS},
+            )
+            response.raise_for_status()
+            data = response.json()
 
             if data.get("status") != "success":
-                logger.warning(f"[GeoIP] ip-api retornó status!=success para {ip_address}")
+                logger.warning("[GeoIP] ip-api retornó status!=success para %s", ip_address)
                 return _GEO_DEFAULT
 
             result = GeoIPResult(
@@ -107,50 +205,59 @@ class GeoIPClient:
                 success    = True,
             )
 
+            self._local[ip_address] = result
             await self._set_cache(ip_address, result)
             return result
 
         except httpx.TimeoutException:
-            logger.warning(f"[GeoIP] Timeout consultando {ip_address}")
-        except Exception as e:
-            logger.error(f"[GeoIP] Error consultando {ip_address}: {e}")
+            logger.warning("[GeoIP] Timeout consultando %s", ip_address)
+        except httpx.HTTPError as e:
+            logger.error("[GeoIP] Error consultando %s: %s", ip_address, e)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error("[GeoIP] Respuesta inválida para %s: %s", ip_address, e)
 
         return _GEO_DEFAULT
 
     async def _get_cache(self, ip: str) -> Optional[GeoIPResult]:
         key = self.CACHE_KEY.format(ip=ip)
         try:
-            import json
-            raw = await redis_manager.client.get(key)
+            return self._decode_cache(await redis_manager.client.get(key))
+        except RedisError:
+            return None
+
+    @staticmethod
+    def _decode_cache(raw: Optional[bytes]) -> Optional[GeoIPResult]:
+        try:
             if raw:
-                data = json.loads(raw)
-                return GeoIPResult(**data)
-        except Exception:
+                data = orjson.loads(raw)
+                # Lista en orden de campos; dict = entrada anterior aún en caché
+                return GeoIPResult(*data) if isinstance(data, list) else GeoIPResult(**data)
+        except (ValueError, TypeError):
             pass
         return None
 
     async def _set_cache(self, ip: str, result: GeoIPResult) -> None:
         key = self.CACHE_KEY.format(ip=ip)
         try:
-            import json
-            from dataclasses import asdict
             await redis_manager.client.setex(
-                key, GEOIP_CACHE_TTL, json.dumps(asdict(result))
+                key, GEOIP_CACHE_TTL,
+                orjson.dumps((
+                    result.ip_country, result.ip_city, result.ip_isp,
+                    result.is_vpn, result.is_hosting,
+                    result.latitude, result.longitude, result.success,
+                )),
             )
-        except Exception:
+        except RedisError:
             pass
 
     def _is_private_ip(self, ip: str) -> bool:
-        private_prefixes = (
-            "127.", "10.", "192.168.", "172.16.", "172.17.",
-            "172.18.", "172.19.", "172.20.", "172.21.", "172.22.",
-            "172.23.", "172.24.", "172.25.", "172.26.", "172.27.",
-            "172.28.", "172.29.", "172.30.", "172.31.", "::1", "fc", "fd",
-        )
-        return any(ip.startswith(p) for p in private_prefixes)
+        return _is_private_ip(ip)
+
+    async def close(self) -> None:
+        await self._client.aclose()
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class BINResult:
     """Resultado del lookup de un BIN de tarjeta."""
     bin_country:   str    
@@ -170,29 +277,67 @@ _BIN_DEFAULT = BINResult(
 
 class BINLookupClient:
     
-    API_URL   = "https://lookup.binlist.net/{bin}"
+    BASE_URL  = "https://lookup.binlist.net"
+    API_PATH  = "/{bin}"
     CACHE_KEY = "bin:lookup:{bin}"
 
-    async def lookup(self, card_bin: str) -> BINResult:
-        bin6 = card_bin[:6]
+    def __init__(self):
+        # HTTPS: HTTP/2 multiplexa los lookups concurrentes en una conexión
+        self._client = httpx.AsyncClient(
+            base_url  = self.BASE_URL,
+            timeout   = BIN_TIMEOUT_SEC,
+            headers   = {"Accept-Version": "3"},
+            transport = httpx.AsyncHTTPTransport(
+                retries = 0,
+                limits  = _HTTP_LIMITS,
+                http2   = True,
+            ),
+        )
+        self._local: TTLCache[str, BINResult] = TTLCache(
+            maxsize = L1_CACHE_MAXSIZE,
+            ttl     = L1_CACHE_TTL,
+        )
+        # BINs que binlist devolvió como 404: no se reconsultan por un rato
+        self._not_found: TTLCache[str, bool] = TTLCache(
+            maxsize = L1_CACHE_MAXSIZE,
+            ttl     = BIN_NOT_FOUND_TTL,
+        )
+        # Llamadas HTTP en curso por BIN (singleflight)
+        self._inflight: dict[str, asyncio.Future] = {}
 
-        cached = await self._get_cache(bin6)
+    async def lookup(self, card_bin: str) -> BINResult:
+        bin6  = card_bin[:6]
+        local = self._local.get(bin6)
+        if local:
+            return local
+        return await self.resolve(bin6, await self._get_cache(bin6))
+
+    async def resolve(self, bin6: str, cached: Optional[BINResult]) -> BINResult:
+        """Completa el lookup con la caché ya leída: si no hubo hit, va a la API."""
         if cached:
+            # Sin renovar el TTL (L1_CACHE_TTL) de una entrada L1 que ya existe
+            if bin6 not in self._local:
+                self._local[bin6] = cached
             return cached
 
+        if bin6 in self._not_found:
+            return _BIN_DEFAULT
+
+        return await _singleflight(
+            self._inflight, bin6, lambda: self._fetch(bin6), _BIN_DEFAULT
+        )
+
+    async def _fetch(self, bin6: str) -> BINResult:
         try:
-            async with httpx.AsyncClient(timeout=BIN_TIMEOUT_SEC) as client:
-                response = await client.get(
-                    self.API_URL.format(bin=bin6),
-                    headers={"Accept-Version": "3"},
-                )
+            response = await self._client.get(self.API_PATH.format(bin=bin6))
 
-                if response.status_code == 404:
-                    logger.debug(f"[BIN] BIN {bin6} no encontrado")
-                    return _BIN_DEFAULT
+            if response.status_code == 404:
+                logger.debug("[BIN] BIN %s no encontrado", bin6)
+                self._not_found[bin6] = True
+                return _BIN_DEFAULT
 
-                response.raise_for_status()
-                data = response.json()
+            response.raise_for_status()
+            data = response.json()
 
             result = BINResult(
                 bin_country = (
@@ -206,39 +351,96 @@ class BINLookupClient:
                 success     = True,
             )
 
+            self._local[bin6] = result
             await self._set_cache(bin6, result)
             return result
 
         except httpx.TimeoutException:
-            logger.warning(f"[BIN] Timeout consultando BIN {bin6}")
-        except Exception as e:
-            logger.error(f"[BIN] Error consultando BIN {bin6}: {e}")
+            logger.warning("[BIN] Timeout consultando BIN %s", bin6)
+        except httpx.HTTPError as e:
+            logger.error("[BIN] Error consultando BIN %s: %s", bin6, e)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error("[BIN] Respuesta inválida para BIN %s: %s", bin6, e)
 
         return _BIN_DEFAULT
 
     async def _get_cache(self, bin6: str) -> Optional[BINResult]:
         key = self.CACHE_KEY.format(bin=bin6)
         try:
-            import json
-            raw = await redis_manager.client.get(key)
+            return self._decode_cache(await redis_manager.client.get(key))
+        except RedisError:
+            return None
+
+    @staticmethod
+    def _decode_cache(raw: Optional[bytes]) -> Optional[BINResult]:
+        try:
             if raw:
-                data = json.loads(raw)
-                return BINResult(**data)
-        except Exception:
+                data = orjson.loads(raw)
+                # Lista en orden de campos; dict = entrada anterior aún en caché
+                return BINResult(*data) if isinstance(data, list) else BINResult(**data)
+        except (ValueError, TypeError):
             pass
         return None
 
     async def _set_cache(self, bin6: str, result: BINResult) -> None:
         key = self.CACHE_KEY.format(bin=bin6)
         try:
-            import json
-            from dataclasses import asdict
             await redis_manager.client.setex(
-                key, BIN_CACHE_TTL, json.dumps(asdict(result))
+                key, BIN_CACHE_TTL,
+                orjson.dumps((
+                    result.bin_country, result.card_type, result.card_brand,
+                    result.bank_name, result.success,
+                )),
             )
-        except Exception:
+        except RedisError:
             pass
 
+    async def close(self) -> None:
+        await self._client.aclose()
+
 geoip_client     = GeoIPClient()
 bin_lookup_client = BINLookupClient()
 
+
+async def lookup_ip_and_bin(ip_address: str, card_bin: Optional[str]) -> list:
+    """
+    GeoIP + BIN de una request: primero la caché L1 en proceso, y lo que
+    falte de ambas cachés Redis con un solo MGET (un round-trip en lugar
+    de dos GET). Solo los misses van a las APIs, en paralelo.
+
+    Devuelve [geo, bin] (o [geo] sin card_bin) con la semántica de
+    asyncio.gather(return_exceptions=True).
+    """
+    geo_private = _is_private_ip(ip_address)
+    bin6        = card_bin[:6] if card_bin else None
+
+    # L1 primero: solo lo que no esté en proceso se pide a Redis
+    geo_local = None if geo_private else geoip_client._local.get(ip_address)
+    bin_local = bin_lookup_client._local.get(bin6) if bin6 else None
+    need_geo  = not geo_private and geo_local is None
+    need_bin  = bin6 is not None and bin_local is None
+
+    keys: list[str] = []
+    if need_geo:
+        keys.append(GeoIPClient.CACHE_KEY.format(ip=ip_address))
+    if need_bin:
+        keys.append(BINLookupClient.CACHE_KEY.format(bin=bin6))
+
+    raws: list = [None] * len(keys)
+    if keys:
+        try:
+            raws = await redis_manager.client.mget(*keys)
+        except RedisError as e:
+            logger.error("[ExternalAPIs] Error leyendo cachés GeoIP/BIN: %s", e)
+
+    if geo_private:
+        tasks = [geoip_client.lookup(ip_address)]
+    else:
+        geo_cached = geo_local or GeoIPClient._decode_cache(raws[0] if need_geo else None)
+        tasks = [geoip_client.resolve(ip_address, geo_cached)]
+    if bin6:
+        bin_cached = bin_local or BINLookupClient._decode_cache(raws[-1] if need_bin else None)
+        tasks.append(bin_lookup_client.resolve(bin6, bin_cached))
+
+    return list(await asyncio.gather(*tasks, return_exceptions=True))
+
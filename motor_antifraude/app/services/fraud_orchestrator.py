@@ -327,6 +327,8 @@ class FraudOrchestrator:
     ) -> FraudEvaluationResponse:
 
         start_time    = time.perf_counter()
+        # Un solo reloj por request, compartido por los módulos que lo aceptan
+        now_ts        = time.time()
         evaluation_id = uuid.uuid4()
         reason_codes: list[str] = []
         # Diccionario de contribuciones reales: reason_code → delta aportado al final_score
@@ -393,6 +395,7 @@ class FraudOrchestrator:
                     if is_p2p and payload.recipient_id
                     else None
                 ),
+                current_ts       = now_ts,
             ),
             self.trust_service.get_trust_profile(           # [5] → TrustProfile
                 user_id      = str(payload.user_id),
@@ -414,7 +417,8 @@ class FraudOrchestrator:
                 amount    = float(payload.amount),
             ),
             time_pattern_scorer.score(                      # [9] → TimePatternResult
-                user_id = str(payload.user_id),
+                user_id    = str(payload.user_id),
+                current_ts = now_ts,
             ),
             self._query_ml_model(payload),                 # [10] → MLModelResult (el módulo de IA)
         ]
@@ -525,7 +529,11 @@ class FraudOrchestrator:
                 reason_codes.append("FAILED_TX_LAST_7D")
                 contributions["FAILED_TX_LAST_7D"] = 10
 
-        if payload.kyc_level == KycLevel.NONE and float(payload.amount) > 500:
+        # "pending" todavía no verificó identidad: pesa igual que "none"
+        if (
+            payload.kyc_level in (KycLevel.NONE, KycLevel.PENDING)
+            and float(payload.amount) > 500
+        ):
             history_penalty += 15
             reason_codes.append("HIGH_AMOUNT_NO_KYC")
             contributions["HIGH_AMOUNT_NO_KYC"] = 15
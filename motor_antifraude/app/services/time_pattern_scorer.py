@@ -19,8 +19,9 @@ Lógica:
 """
 
 import logging
+import time
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
+from typing import Optional
 
 from app.infrastructure.cache.redis_client import redis_manager
 
@@ -48,11 +49,11 @@ class TimePatternScorer:
     async def score(
         self,
         user_id:      str,
+        current_ts:   Optional[float] = None,
     ) -> TimePatternResult:
         result = TimePatternResult()
         redis  = redis_manager.client
-        now    = datetime.now(timezone.utc)
-        hour   = now.hour
+        hour   = time.gmtime(current_ts).tm_hour   # None → hora actual (UTC)
 
         bitmap_key = f"timepattern:user:{user_id}:bitmap"
         count_key  = f"timepattern:user:{user_id}:tx_count"
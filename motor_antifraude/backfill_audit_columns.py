@@ -0,0 +1,74 @@
+import asyncio
+import orjson
+
+from sqlalchemy import text
+
+# Ajustamos para poder ejecutar este script directamente desde la raíz
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.infrastructure.database.session import AsyncSessionLocal
+from app.infrastructure.database.audit_repository import _card_bin_hash, _inet_or_none
+from app.infrastructure.database.dashboard_repository import _decrypt
+
+BATCH_SIZE = 500
+
+
+async def backfill():
+    """
+    Rellena las columnas en claro de transaction_audit (ip_address,
+    card_bin_hash) en las filas anteriores a ellas, descifrando una única
+    vez su encrypted_payload / encrypted_card_bin.
+    Después de correrlo el dashboard ya no necesita descifrar nada.
+    """
+    async with AsyncSessionLocal() as db:
+        print("==> Backfill de columnas derivadas de transaction_audit <==")
+        updated = 0
+        last_id = None
+
+        while True:
+            rows = (await db.execute(
+                text("""
+                    SELECT id, encrypted_payload, encrypted_card_bin
+                    FROM transaction_audit
+                    WHERE (ip_address IS NULL OR card_bin_hash IS NULL)
+                      AND (CAST(:last_id AS uuid) IS NULL OR id > CAST(:last_id AS uuid))
+                    ORDER BY id
+                    LIMIT :limit
+                """),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            )).mappings().all()
+            if not rows:
+                break
+
+            params = []
+            for r in rows:
+                raw      = _decrypt(bytes(r["encrypted_payload"]))
+                ip       = _inet_or_none(orjson.loads(raw).get("ip_address")) if raw else None
+                card_bin = _decrypt(bytes(r["encrypted_card_bin"]))
+                params.append({
+                    "id":       r["id"],
+                    "ip":       ip,
+                    "bin_hash": _card_bin_hash(card_bin) if card_bin else None,
+                })
+
+            await db.execute(
+                text("""
+                    UPDATE transaction_audit
+                    SET ip_address    = COALESCE(ip_address, CAST(:ip AS inet)),
+                        card_bin_hash = COALESCE(card_bin_hash, :bin_hash)
+                    WHERE id = :id
+                """),
+                params,
+            )
+            await db.commit()
+            updated += len(params)
+
+            last_id = str(rows[-1]["id"])
+            print(f"  ... {updated} filas procesadas")
+
+        print(f"Exito. {updated} filas procesadas.")
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
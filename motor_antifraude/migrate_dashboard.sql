@@ -2,6 +2,13 @@
 -- Migración: Dashboard — Tabla merchants + columnas en transaction_audit
 -- Aplicar manualmente en el contenedor Docker:
 --   docker exec -it <postgres_container> psql -U <user> -d <db> -f migrate_dashboard.sql
+--
+-- Orden de despliegue: se puede correr con la versión anterior de la app
+-- todavía en línea. Esa versión no escribe action_code; el trigger del
+-- paso 5 lo completa en cada INSERT para que SET NOT NULL no falle ni
+-- rechace sus filas. Cuando todas las instancias corran la versión nueva:
+--   DROP TRIGGER IF EXISTS trg_audit_fill_action_code ON transaction_audit;
+--   DROP FUNCTION IF EXISTS transaction_audit_fill_action_code();
 -- =======================================================================
 
 -- ── 1. Tabla de comercios (merchants) ────────────────────────────────
@@ -29,7 +36,79 @@ ALTER TABLE transaction_audit
 CREATE INDEX IF NOT EXISTS idx_audit_merchant_id ON transaction_audit (merchant_id);
 CREATE INDEX IF NOT EXISTS idx_audit_created_at  ON transaction_audit (created_at);
 
--- ── 3. Merchants de demo para pruebas ────────────────────────────────
+-- ── 3. IP en claro para el dashboard (evita descifrar el payload) ────
+
+ALTER TABLE transaction_audit
+    ADD COLUMN IF NOT EXISTS ip_address INET;
+
+-- ── 4. Hash determinista del BIN (COUNT DISTINCT exacto) ──────────────
+
+ALTER TABLE transaction_audit
+    ADD COLUMN IF NOT EXISTS card_bin_hash BYTEA;
+
+CREATE INDEX IF NOT EXISTS idx_audit_card_bin_hash ON transaction_audit (card_bin_hash);
+
+-- ── 5. action_code: familia de la acción como SMALLINT ───────────────
+-- 0 = APPROVE, 1 = CHALLENGE_*, 2 = BLOCK_*  (ver ACTION_CODE_* en models.py)
+
+ALTER TABLE transaction_audit
+    ADD COLUMN IF NOT EXISTS action_code SMALLINT;
+
+-- Temporal: deriva action_code de action en los INSERT que no lo traen
+-- (instancias con la versión anterior). Se crea antes del backfill para
+-- cubrir también las filas que entren entre el UPDATE y el SET NOT NULL.
+CREATE OR REPLACE FUNCTION transaction_audit_fill_action_code()
+RETURNS trigger AS $$
+BEGIN
+    IF NEW.action_code IS NULL THEN
+        NEW.action_code := CASE
+            WHEN NEW.action LIKE 'ACTION_BLOCK%'     THEN 2
+            WHEN NEW.action LIKE 'ACTION_CHALLENGE%' THEN 1
+            ELSE 0
+        END;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_audit_fill_action_code ON transaction_audit;
+CREATE TRIGGER trg_audit_fill_action_code
+    BEFORE INSERT ON transaction_audit
+    FOR EACH ROW EXECUTE FUNCTION transaction_audit_fill_action_code();
+
+UPDATE transaction_audit
+SET action_code = CASE
+        WHEN action LIKE 'ACTION_BLOCK%'     THEN 2
+        WHEN action LIKE 'ACTION_CHALLENGE%' THEN 1
+        ELSE 0
+    END
+WHERE action_code IS NULL;
+
+ALTER TABLE transaction_audit
+    ALTER COLUMN action_code SET NOT NULL;
+
+-- ── 6. Índices para los filtros del dashboard ─────────────────────────
+-- CONCURRENTLY no bloquea los INSERT del motor (psql -f corre en autocommit).
+-- idx_audit_user_created (user_id, created_at) ya existe desde models.py.
+-- Los rangos `created_at >= :since` y el ORDER BY created_at DESC LIMIT
+-- del feed los resuelve el btree idx_audit_created_at (paso 2). El BRIN
+-- que agregaba una versión anterior de este script solo sumaba costo de
+-- escritura (el planner prefiere el btree): se elimina si existe.
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_audit_created_brin;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_created_block
+    ON transaction_audit (created_at)
+    WHERE action_code = 2;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_user_created
+    ON transaction_audit (user_id, created_at);
+
+-- Las filas previas quedan en NULL: rellenar ip_address y card_bin_hash
+-- una vez con
+--   python backfill_audit_columns.py
+
+-- ── 7. Merchants de demo para pruebas ────────────────────────────────
 
 INSERT INTO merchants (name, ruc, category) VALUES
     ('Maxiplus S.A.',    '1791234560001', 'ECOMMERCE'),
@@ -15,7 +15,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.domain.models import Merchant, TransactionAudit
 from app.infrastructure.database.session import AsyncSessionLocal
-from app.infrastructure.database.audit_repository import _encrypt
+from app.domain.schemas import ActionDecision
+from app.infrastructure.database.audit_repository import _ACTION_CODE, _card_bin_hash, _encrypt
 
 fake = Faker()
 
@@ -110,13 +111,15 @@ async def seed():
             else:
                 card_bin = str(random.randint(400000, 499999))
             
+            ip_address = fake.ipv4()
+
             payload_dict = {
                 "user_id": str(user_id),
                 "device_id": device_id,
                 "card_bin": card_bin,
                 "amount": str(amount_dec),
                 "currency": "USD",
-                "ip_address": fake.ipv4(),
+                "ip_address": ip_address,
                 "latitude": float(fake.latitude()),
                 "longitude": float(fake.longitude()),
                 "transaction_type": "PAYMENT",
@@ -134,7 +137,9 @@ async def seed():
                 user_id=user_id,
                 encrypted_device_id=_encrypt(device_id.encode()),
                 encrypted_card_bin=_encrypt(card_bin.encode()),
+                card_bin_hash=_card_bin_hash(card_bin),
                 action=action,
+                action_code=_ACTION_CODE[ActionDecision(action)],
                 risk_score=risk_score,
                 reason_codes=reason_codes,
                 transaction_type="PAYMENT",
@@ -147,6 +152,7 @@ async def seed():
                 merchant_name=merchant.name,
                 ip_country=ip_country,
                 gps_country=gps_country,
+                ip_address=ip_address,
                 created_at=created_at
             )
             db.add(audit)
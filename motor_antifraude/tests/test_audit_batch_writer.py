@@ -0,0 +1,92 @@
+"""
+AuditBatchWriter con una sesión falsa: el COPY se simula sobre la cadena
+connection() → get_raw_connection() → driver_connection que usa save_many.
+"""
+
+import asyncio
+import types
+
+from app.infrastructure.database.audit_repository import AuditBatchWriter
+
+
+class _FakeDB:
+    """Tabla en memoria; falla el COPY de cualquier lote con una fila "bad"."""
+
+    def __init__(self, table: list, fail_all: bool = False):
+        self._table    = table
+        self._fail_all = fail_all
+        self._pending: list = []
+        driver = types.SimpleNamespace(copy_records_to_table=self._copy)
+        self._raw = types.SimpleNamespace(driver_connection=driver)
+
+    async def _copy(self, table_name, records, columns):
+        if self._fail_all or any(r[0] == "bad" for r in records):
+            raise RuntimeError("constraint violation")
+        self._pending.extend(records)
+
+    async def connection(self):
+        return self
+
+    async def get_raw_connection(self):
+        return self._raw
+
+    async def commit(self):
+        self._table.extend(self._pending)
+        self._pending.clear()
+
+    async def rollback(self):
+        self._pending.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _writer(table: list, **kwargs) -> AuditBatchWriter:
+    kwargs.setdefault("batch_size", 10)
+    kwargs.setdefault("flush_interval", 0.01)
+    return AuditBatchWriter(session_factory=lambda: _FakeDB(table), **kwargs)
+
+
+def test_failed_copy_falls_back_to_row_by_row():
+    table: list = []
+
+    async def scenario():
+        writer = _writer(table)
+        await writer._flush([("a",), ("bad",), ("c",)])
+
+    asyncio.run(scenario())
+
+    assert [r[0] for r in table] == ["a", "c"]
+
+
+def test_stop_drains_queue_and_rejects_late_submits():
+    table: list = []
+
+    async def scenario():
+        writer = _writer(table, flush_interval=60)
+        await writer.start()
+        assert writer.submit(("a",))
+
+        stop = asyncio.create_task(writer.stop())
+        await asyncio.sleep(0)
+        # Llega después de _STOP: no se encola, el llamador escribe directo
+        assert not writer.is_running
+        assert not writer.submit(("late",))
+        await stop
+
+    asyncio.run(scenario())
+
+    assert [r[0] for r in table] == ["a"]
+
+
+def test_full_queue_rejects_submit():
+    async def scenario():
+        writer = _writer([], max_queue_size=1)
+        writer._queue = asyncio.Queue(maxsize=1)
+        assert writer.submit(("a",))
+        assert not writer.submit(("b",))
+
+    asyncio.run(scenario())
@@ -0,0 +1,139 @@
+"""
+Transiciones de kyc_level del registro con foto: pending → basic / none.
+AsyncSessionLocal se reemplaza por una sesión falsa que guarda los
+UPDATE ejecutados; face_service por un doble con el resultado deseado.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.exceptions import FaceNotDetectedException
+from app.domain.schemas import KycLevel
+from app.services import auth_service as auth_module
+from app.services.auth_service import AuthService
+
+
+class _FakeResult:
+    rowcount = 0
+
+
+class _FakeSession:
+    def __init__(self, log: list):
+        self._log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        self._log.append(stmt.compile().params)
+        return _FakeResult()
+
+    async def commit(self):
+        pass
+
+
+class _FaceService:
+    def __init__(self, outcome=None, delay: float = 0.0):
+        self._outcome = outcome
+        self._delay   = delay
+
+    async def process_registration_photo(self, image: bytes):
+        if self._delay:
+            await asyncio.sleep(self._delay)
+        if isinstance(self._outcome, BaseException):
+            raise self._outcome
+        return b"img-enc", b"encoding-enc"
+
+
+@pytest.fixture
+def updates(monkeypatch) -> list:
+    log: list = []
+    monkeypatch.setattr(auth_module, "AsyncSessionLocal", lambda: _FakeSession(log))
+    return log
+
+
+def _run_face(service, user_id=None):
+    return asyncio.run(service._process_face_async(user_id or uuid.uuid4(), b"jpg"))
+
+
+def test_pending_is_a_valid_kyc_level():
+    assert KycLevel("pending") is KycLevel.PENDING
+
+
+def test_face_detected_moves_pending_to_basic(monkeypatch, updates):
+    monkeypatch.setattr(auth_module, "face_service", _FaceService())
+
+    _run_face(AuthService())
+
+    assert len(updates) == 1
+    assert updates[0]["kyc_level"] == KycLevel.BASIC.value
+    assert updates[0]["face_image_encrypted"] == b"img-enc"
+    assert updates[0]["face_encoding_encrypted"] == b"encoding-enc"
+
+
+@pytest.mark.parametrize("outcome", [FaceNotDetectedException(), RuntimeError("dlib")])
+def test_no_face_or_failure_moves_pending_to_none(monkeypatch, updates, outcome):
+    monkeypatch.setattr(auth_module, "face_service", _FaceService(outcome))
+
+    _run_face(AuthService())
+
+    assert updates[0]["kyc_level"] == KycLevel.NONE.value
+    assert updates[0]["face_image_encrypted"] is None
+
+
+def test_missing_face_service_moves_pending_to_none(monkeypatch, updates):
+    monkeypatch.setattr(auth_module, "face_service", None)
+
+    _run_face(AuthService())
+
+    assert updates[0]["kyc_level"] == KycLevel.NONE.value
+
+
+def test_aclose_cancels_slow_tasks_and_stores_none(monkeypatch, updates):
+    monkeypatch.setattr(auth_module, "face_service", _FaceService(delay=60))
+
+    async def scenario():
+        service = AuthService()
+        task = asyncio.create_task(service._process_face_async(uuid.uuid4(), b"jpg"))
+        service._face_tasks.add(task)
+        task.add_done_callback(service._face_tasks.discard)
+        await asyncio.sleep(0)
+
+        await service.aclose(timeout=0.01)
+        return task
+
+    task = asyncio.run(scenario())
+
+    assert task.cancelled()
+    assert updates[0]["kyc_level"] == KycLevel.NONE.value
+
+
+def test_aclose_waits_for_tasks_that_finish_in_time(monkeypatch, updates):
+    monkeypatch.setattr(auth_module, "face_service", _FaceService(delay=0.01))
+
+    async def scenario():
+        service = AuthService()
+        task = asyncio.create_task(service._process_face_async(uuid.uuid4(), b"jpg"))
+        service._face_tasks.add(task)
+        task.add_done_callback(service._face_tasks.discard)
+
+        await service.aclose(timeout=5)
+        return task
+
+    task = asyncio.run(scenario())
+
+    assert not task.cancelled()
+    assert updates[0]["kyc_level"] == KycLevel.BASIC.value
+
+
+def test_recover_stale_pending_targets_only_old_pending_rows(updates):
+    asyncio.run(AuthService().recover_stale_pending())
+
+    params = updates[0]
+    assert params["kyc_level"] == KycLevel.NONE.value
+    assert KycLevel.PENDING.value in params.values()
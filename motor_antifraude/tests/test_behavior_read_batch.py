@@ -0,0 +1,166 @@
+"""
+Micro-batching de lecturas de BehaviorEngine (_read_batched →
+_flush_read_batch → _execute_read_batch) junto con la caché local y el
+singleflight por usuario, contra fakeredis.
+"""
+
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+import orjson
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.services.behavior_engine import BehaviorEngine
+
+# Un waiter que nunca recibe su resultado debe fallar el test, no colgarlo
+_TIMEOUT = 2.0
+
+
+def _run(coro):
+    return asyncio.run(asyncio.wait_for(coro, _TIMEOUT))
+
+
+def _hash_profile(avg: float) -> dict:
+    return {"avg_amount": avg, "account_age_days": 40, "typical_hours_mask": 0xFFFFFF}
+
+
+async def _seed(redis) -> None:
+    for i in range(4):
+        await redis.hset(f"behavior:user:u{i}:profile", mapping=_hash_profile(10.0 + i))
+        await redis.hset(f"behavior:user:u{i}:recipients", "r", i + 1)
+    # Perfil heredado guardado como JSON (string) → HMGET da WRONGTYPE
+    await redis.set(
+        "behavior:user:legacy:profile",
+        orjson.dumps({"avg_amount": 99.0, "account_age_days": 50, "typical_hours": [9, 10]}),
+    )
+
+
+def _count_batches(engine: BehaviorEngine) -> list:
+    sizes: list = []
+    original = engine._execute_read_batch
+
+    async def counting(batch):
+        sizes.append(len(batch))
+        return await original(batch)
+
+    engine._execute_read_batch = counting
+    return sizes
+
+
+def test_mixed_p2p_and_plain_reads_are_sliced_per_waiter():
+    async def scenario():
+        redis = fakeredis.aioredis.FakeRedis()
+        await _seed(redis)
+        engine = BehaviorEngine(redis)
+        sizes  = _count_batches(engine)
+
+        results = await asyncio.gather(
+            engine._fetch_state("u0", "r"),
+            engine._fetch_state("u1", None),
+            engine._fetch_state("u2", "r"),
+            engine._fetch_state("u3", None),
+            engine._fetch_state("nobody", "r"),
+        )
+        return sizes, results
+
+    sizes, results = _run(scenario())
+
+    assert sizes == [5]   # un solo pipeline para las cinco lecturas
+    (p0, c0), (p1, c1), (p2, c2), (p3, c3), (missing, c_missing) = results
+    assert (p0.avg_transaction_amount, c0) == (10.0, 1)
+    assert (p1.avg_transaction_amount, c1) == (11.0, 0)
+    assert (p2.avg_transaction_amount, c2) == (12.0, 3)
+    assert (p3.avg_transaction_amount, c3) == (13.0, 0)
+    assert (missing, c_missing) == (None, 0)
+
+
+def test_legacy_json_profile_falls_back_to_get_inside_a_batch():
+    async def scenario():
+        redis = fakeredis.aioredis.FakeRedis()
+        await _seed(redis)
+        engine = BehaviorEngine(redis)
+
+        return await asyncio.gather(
+            engine._fetch_state("legacy", "r"),
+            engine._fetch_state("u0", "r"),
+        )
+
+    (legacy, legacy_count), (hashed, hashed_count) = _run(scenario())
+
+    assert legacy.avg_transaction_amount == 99.0
+    assert legacy.typical_hours_mask == (1 << 9) | (1 << 10)
+    assert legacy_count == 0
+    assert (hashed.avg_transaction_amount, hashed_count) == (10.0, 1)
+
+
+def test_waiter_cancelled_while_batch_in_flight():
+    async def scenario():
+        redis = fakeredis.aioredis.FakeRedis()
+        await _seed(redis)
+        engine  = BehaviorEngine(redis)
+        release = asyncio.Event()
+        original = engine._execute_read_batch
+
+        async def held(batch):
+            await release.wait()
+            return await original(batch)
+
+        engine._execute_read_batch = held
+
+        cancelled = asyncio.create_task(engine._fetch_state("u0", "r"))
+        survivor  = asyncio.create_task(engine._fetch_state("u1", "r"))
+        await asyncio.sleep(0.01)                 # la ventana ya se vació
+        follower  = asyncio.create_task(engine._fetch_state("u0", None))
+        await asyncio.sleep(0)
+        assert engine._flush_tasks                # batch en vuelo
+
+        cancelled.cancel()
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        survivor_result = await survivor
+        follower_result = await follower
+        await asyncio.gather(*engine._flush_tasks)
+        return engine, survivor_result, follower_result
+
+    engine, (p1, c1), follower_result = _run(scenario())
+
+    assert (p1.avg_transaction_amount, c1) == (11.0, 2)
+    # El singleflight del cancelado libera a su seguidor con "sin perfil"
+    assert follower_result == (None, 0)
+    assert engine._inflight == {}
+    assert engine._read_batch == []
+
+
+def test_pipeline_error_reaches_every_waiter():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        redis  = fakeredis.aioredis.FakeRedis(server=server)
+        await _seed(redis)
+        server.connected = False
+        engine = BehaviorEngine(redis)
+
+        loop    = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in range(3)]
+        await engine._execute_read_batch([
+            ("u0", "r",  futures[0]),
+            ("u1", None, futures[1]),
+            ("u2", "r",  futures[2]),
+        ])
+        errors = [f.exception() for f in futures]
+
+        results = await asyncio.gather(
+            engine._fetch_state("u0", "r"),
+            engine._fetch_state("u0", None),
+            engine._fetch_state("u1", None),
+        )
+        return engine, errors, results
+
+    engine, errors, results = _run(scenario())
+
+    assert all(isinstance(e, ConnectionError) for e in errors)
+    assert results == [(None, 0), (None, 0), (None, 0)]
+    assert engine._inflight == {}
@@ -0,0 +1,75 @@
+"""
+Caché del resumen del dashboard: solo se guarda cuando todas las
+sub-consultas respondieron. Redis es fakeredis; las sub-consultas se
+reemplazan por corutinas que devuelven vacío o fallan.
+"""
+
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+from app.infrastructure.cache.redis_client import redis_manager
+from app.infrastructure.database import dashboard_repository as dash_module
+from app.infrastructure.database.dashboard_repository import DashboardRepository
+
+
+class _NoSession:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(redis_manager, "client", client)
+    return client
+
+
+def _repo(monkeypatch, failing: str = "") -> DashboardRepository:
+    async def ok_kpis(self, db, since):
+        return dash_module._empty_kpis()
+
+    async def ok_list(self, db, since, *limit):
+        return []
+
+    async def boom(self, db, since, *limit):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(DashboardRepository, "_get_kpis", ok_kpis)
+    for name in (
+        "_get_geo_discrepancies", "_get_transaction_feed",
+        "_get_merchant_heatmap", "_get_identity_risks",
+    ):
+        monkeypatch.setattr(DashboardRepository, name, ok_list)
+    if failing:
+        monkeypatch.setattr(DashboardRepository, failing, boom)
+
+    return DashboardRepository(db=None, session_factory=_NoSession)
+
+
+def test_complete_summary_is_cached(monkeypatch, fake_redis):
+    summary = asyncio.run(_repo(monkeypatch).get_summary())
+
+    assert summary.kpis.total_tx == 0
+    assert asyncio.run(fake_redis.keys("dashboard:summary:*"))
+
+
+@pytest.mark.parametrize("failing", ["_get_kpis", "_get_transaction_feed"])
+def test_degraded_summary_is_served_but_not_cached(monkeypatch, fake_redis, failing):
+    summary = asyncio.run(_repo(monkeypatch, failing).get_summary())
+
+    assert summary.kpis.total_tx == 0
+    assert summary.transaction_feed == []
+    assert not asyncio.run(fake_redis.keys("dashboard:summary:*"))
+
+
+def test_invalid_cached_summary_is_recomputed(monkeypatch, fake_redis):
+    asyncio.run(fake_redis.set("dashboard:summary:24:20:30", b"{not json"))
+
+    summary = asyncio.run(_repo(monkeypatch).get_summary())
+
+    assert summary.period_hours == 24
@@ -0,0 +1,63 @@
+"""
+GeoIP / BIN ante fallos: Redis caído, HTTP 5xx y cuerpos inválidos
+siempre terminan en el resultado por defecto. HTTP con
+httpx.MockTransport y Redis con fakeredis.
+"""
+
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+import httpx
+import pytest
+
+from app.infrastructure.cache.redis_client import redis_manager
+from app.services.external_apis import (
+    _BIN_DEFAULT,
+    _GEO_DEFAULT,
+    BINLookupClient,
+    GeoIPClient,
+)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis_manager, "client", fakeredis.aioredis.FakeRedis(server=server)
+    )
+    return server
+
+
+def _with_response(client, response: httpx.Response):
+    client._client = httpx.AsyncClient(
+        base_url  = client.BASE_URL,
+        transport = httpx.MockTransport(lambda request: response),
+    )
+    return client
+
+
+@pytest.mark.parametrize("body", [b"null", b"not json", b"[]"])
+def test_geoip_invalid_body_returns_default(server, body):
+    client = _with_response(GeoIPClient(), httpx.Response(200, content=body))
+
+    assert asyncio.run(client.lookup("8.8.8.8")) == _GEO_DEFAULT
+
+
+def test_bin_http_error_returns_default(server):
+    client = _with_response(BINLookupClient(), httpx.Response(500))
+
+    assert asyncio.run(client.lookup("41111111")) == _BIN_DEFAULT
+
+
+def test_redis_down_still_resolves_over_http(server):
+    server.connected = False
+    client = _with_response(
+        GeoIPClient(),
+        httpx.Response(200, json={"status": "success", "countryCode": "EC"}),
+    )
+
+    result = asyncio.run(client.lookup("8.8.8.8"))
+
+    assert result.success
+    assert result.ip_country == "EC"
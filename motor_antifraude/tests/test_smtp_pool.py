@@ -0,0 +1,80 @@
+"""
+SMTPPool con clientes falsos en lugar de aiosmtplib.SMTP: ningún camino
+(cancelación durante NOOP, release después de close) pierde un slot ni
+recrea el pool.
+"""
+
+import asyncio
+
+import aiosmtplib
+import pytest
+
+from app.infrastructure.messaging.email_service import SMTPPool
+
+
+class _FakeSMTP:
+    noop_delay = 0.0
+
+    def __init__(self, **kwargs):
+        self.is_connected = False
+        self.connects     = 0
+
+    async def connect(self):
+        self.is_connected = True
+        self.connects    += 1
+
+    async def login(self, user, password):
+        pass
+
+    async def noop(self):
+        await asyncio.sleep(self.noop_delay)
+
+    async def quit(self):
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    monkeypatch.setattr(aiosmtplib, "SMTP", _FakeSMTP)
+    _FakeSMTP.noop_delay = 0.0
+
+
+def test_cancel_during_noop_returns_client_to_pool():
+    async def scenario():
+        pool = SMTPPool(size=1)
+        await pool.start()
+
+        _FakeSMTP.noop_delay = 60
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # El slot sigue disponible y la sesión a medias se reconecta
+        _FakeSMTP.noop_delay = 0.0
+        client = await asyncio.wait_for(pool.acquire(), timeout=1)
+        assert client.connects == 2
+        pool.release(client)
+
+    asyncio.run(scenario())
+
+
+def test_release_after_close_does_not_rebuild_pool():
+    async def scenario():
+        pool = SMTPPool(size=1)
+        await pool.start()
+        client = await pool.acquire()
+
+        await pool.close()
+        pool.release(client)
+
+        assert pool._queue is None
+        assert not client.is_connected
+        with pytest.raises(aiosmtplib.SMTPException):
+            await pool.acquire()
+
+    asyncio.run(scenario())